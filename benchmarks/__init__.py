@@ -0,0 +1,4 @@
+"""Benchmarks for the RPC path, built on the calculator API from the tests.
+
+Run with `python -m benchmarks` from the repository root.
+"""
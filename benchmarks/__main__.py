@@ -0,0 +1,68 @@
+"""Run the benchmarks, optionally saving and comparing results."""
+from asyncio import run
+from datetime import datetime, timezone
+from importlib import import_module
+from json import dump, load
+from platform import platform, python_version
+from typing import List, Optional
+
+import typer
+
+SUITES = ("codec", "server", "client", "e2e", "startup")
+
+
+def main(
+    suites: Optional[List[str]] = typer.Argument(None),
+    calls: int = typer.Option(10_000, "--calls", "-n"),
+    output: Optional[str] = typer.Option(None, "--output", "-o"),
+    compare: Optional[str] = typer.Option(None, "--compare", "-c"),
+    threshold: float = typer.Option(0.1, "--threshold"),
+):
+    """Run benchmark suites (all by default) and print the results.
+
+    Results can be saved as JSON, and compared against an earlier run;
+    throughput dropping by more than the threshold counts as a regression.
+    """
+    results = []
+    for suite in suites or SUITES:
+        if suite not in SUITES:
+            raise typer.BadParameter(f"Unknown suite: {suite}")
+        mod = import_module(f".bench_{suite}", __package__)
+        for res in run(mod.run(calls)):  # type: ignore
+            print(res)
+            results.append(res.to_dict())
+
+    if output is not None:
+        with open(output, "w") as f:
+            dump(
+                {
+                    "python": python_version(),
+                    "platform": platform(),
+                    "time": datetime.now(timezone.utc).isoformat(),
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+    if compare is not None:
+        with open(compare) as f:
+            baseline = {r["name"]: r for r in load(f)["results"]}
+        regressions = 0
+        print()
+        for r in results:
+            old = baseline.get(r["name"])
+            if old is None:
+                continue
+            ratio = r["calls_per_second"] / old["calls_per_second"]
+            flag = ""
+            if ratio < 1 - threshold:
+                flag = "  REGRESSION"
+                regressions += 1
+            print(f"{r['name']:<48} {ratio:>7.2f}x{flag}")
+        if regressions:
+            raise typer.Exit(1)
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -0,0 +1,86 @@
+"""Measuring and recording benchmark results."""
+from asyncio import gather
+from time import perf_counter
+from typing import Awaitable, Callable, Dict, List, Union
+
+import attr
+
+
+@attr.s(slots=True, frozen=True)
+class Result:
+    name: str = attr.ib()
+    calls: int = attr.ib()
+    seconds: float = attr.ib()
+    p50: float = attr.ib()
+    p90: float = attr.ib()
+    p99: float = attr.ib()
+
+    @property
+    def calls_per_second(self) -> float:
+        return self.calls / self.seconds
+
+    def to_dict(self) -> Dict[str, Union[str, float]]:
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "seconds": self.seconds,
+            "calls_per_second": self.calls_per_second,
+            "p50_us": self.p50 * 1e6,
+            "p90_us": self.p90 * 1e6,
+            "p99_us": self.p99 * 1e6,
+        }
+
+    def __str__(self) -> str:
+        return (
+            f"{self.name:<48} {self.calls_per_second:>12,.0f} calls/s"
+            f"  p50 {self.p50 * 1e6:>9.1f}us"
+            f"  p99 {self.p99 * 1e6:>9.1f}us"
+        )
+
+
+def _percentile(latencies: List[float], p: float) -> float:
+    return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+
+
+def _result(name: str, seconds: float, latencies: List[float]) -> Result:
+    latencies.sort()
+    return Result(
+        name,
+        len(latencies),
+        seconds,
+        _percentile(latencies, 0.5),
+        _percentile(latencies, 0.9),
+        _percentile(latencies, 0.99),
+    )
+
+
+def measure(name: str, fn: Callable[[], object], calls: int) -> Result:
+    """Measure a synchronous function."""
+    latencies = []
+    start = perf_counter()
+    for _ in range(calls):
+        t0 = perf_counter()
+        fn()
+        latencies.append(perf_counter() - t0)
+    return _result(name, perf_counter() - start, latencies)
+
+
+async def measure_async(
+    name: str,
+    fn: Callable[[], Awaitable[object]],
+    calls: int,
+    concurrency: int = 1,
+) -> Result:
+    """Measure a coroutine function, from `concurrency` tasks at once."""
+    latencies: List[float] = []
+    per_worker = calls // concurrency
+
+    async def worker() -> None:
+        for _ in range(per_worker):
+            t0 = perf_counter()
+            await fn()
+            latencies.append(perf_counter() - t0)
+
+    start = perf_counter()
+    await gather(*(worker() for _ in range(concurrency)))
+    return _result(name, perf_counter() - start, latencies)
@@ -0,0 +1,35 @@
+"""The overhead of client stubs, over an in-process adapter."""
+from contextlib import asynccontextmanager
+from typing import List
+
+from pyrseia import close_client, create_client
+from pyrseia.wire import Call
+
+from tests.calculator import Calculator
+
+from ._harness import Result, measure_async
+
+
+@asynccontextmanager
+async def null_adapter():
+    async def sender(call: Call, _):
+        return 3
+
+    yield sender
+
+
+async def run(calls: int) -> List[Result]:
+    res = []
+    for single_flight in (False, True):
+        client = await create_client(
+            Calculator, null_adapter(), single_flight=single_flight
+        )
+        res.append(
+            await measure_async(
+                f"client.stub[single_flight={single_flight}]",
+                lambda: client.add(1, 2),
+                calls,
+            )
+        )
+        await close_client(client)
+    return res
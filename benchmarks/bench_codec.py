@@ -0,0 +1,33 @@
+"""The cost of encoding and decoding calls with msgpack and cattrs."""
+from typing import List
+
+from msgpack import dumps, loads
+
+from pyrseia.wire import Call, converter
+
+from ._harness import Result, measure
+
+PAYLOAD_SIZES = (16, 1024, 64 * 1024)
+
+
+async def run(calls: int) -> List[Result]:
+    res = []
+    for size in PAYLOAD_SIZES:
+        call = Call("call_four", (1, "a" * size, 1.0, b"b" * size))
+        payload = dumps(converter.unstructure(call))
+
+        res.append(
+            measure(
+                f"codec.encode[{size}]",
+                lambda: dumps(converter.unstructure(call)),
+                calls,
+            )
+        )
+        res.append(
+            measure(
+                f"codec.decode[{size}]",
+                lambda: converter.structure(loads(payload), Call),
+                calls,
+            )
+        )
+    return res
@@ -0,0 +1,116 @@
+"""End-to-end calls over real transports, on localhost."""
+from asyncio import Event, create_task, sleep
+from os import path
+from socket import socket
+from tempfile import TemporaryDirectory
+from typing import List
+
+from aiohttp.web import AppRunner, TCPSite
+from hypercorn.asyncio import serve
+from hypercorn.config import Config
+
+from pyrseia import close_client, create_client, server
+from pyrseia.aiohttp import aiohttp_client_adapter, create_aiohttp_app
+from pyrseia.asgi import create_asgi_app
+from pyrseia.httpx import httpx_client_adapter
+from pyrseia.shm import serve_shm, shm_client_adapter
+from pyrseia.starlette import create_starlette_app
+
+from tests.calculator import Calculator
+
+from ._harness import Result, measure_async
+
+CONCURRENCY = (1, 16)
+
+
+def _calculator():
+    serv = server(Calculator)
+
+    @serv.implement(Calculator.add)
+    async def add(a: int, b: int) -> int:
+        return a + b
+
+    return serv
+
+
+def _unused_port() -> int:
+    with socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _measure_clients(
+    prefix: str, url: str, calls: int, client_adapters
+) -> List[Result]:
+    res = []
+    for client_name, adapter_factory in client_adapters:
+        client = await create_client(Calculator, adapter_factory(url))
+        for concurrency in CONCURRENCY:
+            res.append(
+                await measure_async(
+                    f"e2e.{prefix}+{client_name}[concurrency={concurrency}]",
+                    lambda: client.add(1, 2),
+                    calls,
+                    concurrency,
+                )
+            )
+        await close_client(client)
+    return res
+
+
+async def run(calls: int) -> List[Result]:
+    clients = [
+        ("aiohttp", aiohttp_client_adapter),
+        ("httpx", httpx_client_adapter),
+    ]
+    res = []
+
+    port = _unused_port()
+    runner = AppRunner(create_aiohttp_app(_calculator()))
+    await runner.setup()
+    await TCPSite(runner, "127.0.0.1", port).start()
+    try:
+        res.extend(
+            await _measure_clients(
+                "aiohttp", f"http://127.0.0.1:{port}", calls, clients
+            )
+        )
+    finally:
+        await runner.cleanup()
+
+    for name, app_factory in (
+        ("starlette", create_starlette_app),
+        ("asgi", create_asgi_app),
+    ):
+        port = _unused_port()
+        config = Config()
+        config.bind = [f"127.0.0.1:{port}"]
+        config.accesslog = None
+        shutdown = Event()
+        task = create_task(
+            serve(
+                app_factory(_calculator()),  # type: ignore
+                config,
+                shutdown_trigger=shutdown.wait,  # type: ignore
+            )
+        )
+        await sleep(0.2)  # Wait for the server to start up.
+        try:
+            res.extend(
+                await _measure_clients(
+                    name, f"http://127.0.0.1:{port}", calls, clients
+                )
+            )
+        finally:
+            shutdown.set()
+            await task
+
+    with TemporaryDirectory() as tmp:
+        socket_path = path.join(tmp, "pyrseia.sock")
+        async with serve_shm(_calculator(), socket_path):
+            res.extend(
+                await _measure_clients(
+                    "shm", socket_path, calls, [("shm", shm_client_adapter)]
+                )
+            )
+    return res
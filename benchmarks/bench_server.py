@@ -0,0 +1,68 @@
+"""Dispatch through `Server.process`, with and without middleware."""
+from typing import Any, List
+
+from pyrseia import scoped, server
+from pyrseia.scheduling import FairScheduler
+from pyrseia.wire import Call
+
+from tests.calculator import Calculator
+
+from ._harness import Result, measure_async
+
+MIDDLEWARE_COUNTS = (0, 1, 5, 10)
+
+
+async def passthrough(ctx: Any, call: Call, next) -> Any:
+    return await next(ctx, call)
+
+
+async def run(calls: int) -> List[Result]:
+    res = []
+    call = Call("add", (1, 2))
+    for count in MIDDLEWARE_COUNTS:
+        serv = server(Calculator, middleware=[passthrough] * count)
+
+        @serv.implement(Calculator.add)
+        async def add(a: int, b: int) -> int:
+            return a + b
+
+        res.append(
+            await measure_async(
+                f"server.process[middleware={count}]",
+                lambda: serv.process(call, None),
+                calls,
+            )
+        )
+
+    # Middleware scoped to other methods shouldn't cost anything.
+    serv = server(
+        Calculator, middleware=[scoped(passthrough, "multiply")] * 10
+    )
+
+    @serv.implement(Calculator.add)
+    async def scoped_add(a: int, b: int) -> int:
+        return a + b
+
+    res.append(
+        await measure_async(
+            "server.process[middleware=10, scoped away]",
+            lambda: serv.process(call, None),
+            calls,
+        )
+    )
+
+    # Admission below the scheduler's limit is a counter bump.
+    serv = server(Calculator, scheduler=FairScheduler())
+
+    @serv.implement(Calculator.add)
+    async def scheduled_add(a: int, b: int) -> int:
+        return a + b
+
+    res.append(
+        await measure_async(
+            "server.process[scheduled, uncontended]",
+            lambda: serv.process(call, None),
+            calls,
+        )
+    )
+    return res
@@ -0,0 +1,25 @@
+"""Startup time: importing pyrseia, and running the CLI."""
+from subprocess import DEVNULL, run as run_process
+from sys import executable
+from typing import List
+
+from ._harness import Result, measure
+
+# Each run starts an interpreter, so fewer runs are needed.
+MAX_RUNS = 20
+
+COMMANDS = (
+    ("startup.import", [executable, "-c", "import pyrseia"]),
+    ("startup.cli", [executable, "-m", "pyrseia", "--help"]),
+)
+
+
+async def run(calls: int) -> List[Result]:
+    return [
+        measure(
+            name,
+            lambda: run_process(command, stdout=DEVNULL, check=True),
+            min(calls, MAX_RUNS),
+        )
+        for name, command in COMMANDS
+    ]
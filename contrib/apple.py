@@ -1,5 +1,20 @@
+from asyncio import sleep
 from enum import Enum, IntEnum, unique
-from typing import List, Optional
+from heapq import nlargest
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    overload,
+)
 
 import attr
 from aiohttp import ClientSession
@@ -9,15 +24,21 @@ from ujson import dumps, loads
 
 from pyrseia import create_client, rpc
 from pyrseia.aiohttp import aiohttp_client_adapter
+from pyrseia.batch import bounded_map
+from pyrseia.retry import RetryPolicy
 from pyrseia.wire import Call
 
 PRODUCTION_URL = "https://buy.itunes.apple.com/verifyReceipt"
 SANDBOX_URL = "https://sandbox.itunes.apple.com/verifyReceipt"
 APP_STORE_CONVERTER = Converter()
 
-APP_STORE_CONVERTER.register_structure_hook(
-    DateTime, lambda m, _: from_timestamp(float(m) / 1000)
-)
+
+def _structure_datetime(ms: Any, _: Any) -> DateTime:
+    """App Store dates are in milliseconds since the epoch."""
+    return from_timestamp(float(ms) / 1000)
+
+
+APP_STORE_CONVERTER.register_structure_hook(DateTime, _structure_datetime)
 
 
 @attr.s(slots=True, frozen=True)
@@ -89,7 +110,7 @@ class ResponseBody:
         bundle_id: str = attr.ib()
         download_id: int = attr.ib()
 
-        in_app: List[InApp] = attr.ib()
+        in_app: Sequence[InApp] = attr.ib()
         original_application_version: str = attr.ib()
         original_purchase_date: str = attr.ib()
         original_purchase_date_ms: DateTime = attr.ib()
@@ -127,6 +148,83 @@ class ResponseBody:
     is_retryable: Optional[int] = attr.ib(default=None)
 
 
+InApp = ResponseBody.Receipt.InApp
+
+
+class LazyInApps(Sequence[InApp]):
+    """In-app purchases, structured when first accessed.
+
+    Long-lived subscribers' receipts can have thousands of purchases, most
+    of which are never looked at. Purchases that can't be parsed raise
+    `ParseError` when they are accessed, not when the receipt is.
+    """
+
+    __slots__ = ("_raw", "_structured")
+
+    def __init__(self, raw: List[Dict[str, Any]]) -> None:
+        self._raw = raw
+        self._structured: List[Optional[InApp]] = [None] * len(raw)
+
+    def __len__(self) -> int:
+        return len(self._raw)
+
+    @overload
+    def __getitem__(self, index: int) -> InApp:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[InApp]:
+        ...
+
+    def __getitem__(
+        self, index: Union[int, slice]
+    ) -> Union[InApp, List[InApp]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        res = self._structured[index]
+        if res is None:
+            raw = self._raw[index]
+            try:
+                res = APP_STORE_CONVERTER.structure(raw, InApp)
+            except Exception as exc:
+                raise ParseError(dumps(raw).encode()) from exc
+            self._structured[index] = res
+        return res
+
+    def latest(self, n: int) -> List[InApp]:
+        """The `n` latest purchases, by purchase date."""
+        try:
+            indices = nlargest(
+                n,
+                range(len(self._raw)),
+                key=lambda i: int(self._raw[i]["purchase_date_ms"]),
+            )
+        except (KeyError, TypeError, ValueError) as exc:
+            raise ParseError(dumps(self._raw).encode()) from exc
+        return [self[i] for i in indices]
+
+    def for_product(self, product_id: str) -> List[InApp]:
+        """The purchases of a product."""
+        return [
+            self[i]
+            for i, raw in enumerate(self._raw)
+            if isinstance(raw, dict) and raw.get("product_id") == product_id
+        ]
+
+
+APP_STORE_CONVERTER.register_structure_hook_func(
+    lambda t: t == Sequence[InApp],
+    lambda raw, _: [APP_STORE_CONVERTER.structure(r, InApp) for r in raw],
+)
+
+# Structures receipts with `LazyInApps`, instead of lists.
+LAZY_APP_STORE_CONVERTER = Converter()
+LAZY_APP_STORE_CONVERTER.register_structure_hook(DateTime, _structure_datetime)
+LAZY_APP_STORE_CONVERTER.register_structure_hook_func(
+    lambda t: t == Sequence[InApp], lambda raw, _: LazyInApps(raw)
+)
+
+
 @attr.s(auto_exc=True, auto_attribs=True)
 class HttpError(Exception):
     status_code: int
@@ -150,28 +248,116 @@ class AppStoreVerifier:
         ...
 
 
-async def sender(session: ClientSession, call: Call, _) -> ResponseBody:
-    payload = {"receipt-data": call.args[0]}
-    if call.args[1] is not None:
-        payload["password"] = call.args[1]
-    if call.args[2]:
-        payload["exclude-old-transactions"] = True
+RETRYABLE_STATUSES = frozenset(
+    (
+        ResponseBody.Status.RETRY_TEMPORARY_ISSUE,
+        ResponseBody.Status.RETRY_RECEIPT_SERVER_UNAVAILABLE,
+        ResponseBody.Status.RETRY_INTERNAL_DATA_ACCESS,
+    )
+)
+
+
+async def _post(
+    session: ClientSession, url: str, payload: str
+) -> Tuple[bytes, Dict[str, Any]]:
     async with session.post(
-        PRODUCTION_URL,
-        data=dumps(payload),
-        headers={"content-type": "application/json"},
+        url, data=payload, headers={"content-type": "application/json"},
     ) as resp:
         if resp.status != 200:
             raise HttpError(resp.status)
         resp_payload = await resp.read()
+    try:
+        raw = loads(resp_payload)
+    except Exception as exc:
+        raise ParseError(resp_payload) from exc
+    if not isinstance(raw, dict):
+        raise ParseError(resp_payload)
+    return resp_payload, raw
+
+
+def app_store_sender(
+    retry: RetryPolicy = RetryPolicy(base_delay=0.5, max_delay=5.0),
+    lazy: bool = False,
+) -> Callable[[ClientSession, Call, Any], Awaitable[ResponseBody]]:
+    """Create a sender verifying receipts in production, then sandbox.
+
+    Sandbox receipts are verified again against the sandbox, and responses
+    with a retryable status are retried with backoff, up to the retry
+    policy's attempts.
+
+    If `lazy`, the receipt's in-app purchases are a `LazyInApps`.
+    """
+    converter = LAZY_APP_STORE_CONVERTER if lazy else APP_STORE_CONVERTER
+
+    async def sender(
+        session: ClientSession, call: Call, _
+    ) -> ResponseBody:
+        payload = {"receipt-data": call.args[0]}
+        if call.args[1] is not None:
+            payload["password"] = call.args[1]
+        if call.args[2]:
+            payload["exclude-old-transactions"] = True
+        data = dumps(payload)
+
+        url = PRODUCTION_URL
+        attempt = 0
+        while True:
+            resp_payload, raw = await _post(session, url, data)
+            status = raw.get("status")
+            if status == ResponseBody.Status.SANDBOX_RECEIPT:
+                if url == PRODUCTION_URL:
+                    url = SANDBOX_URL
+                    continue
+            attempt += 1
+            if status not in RETRYABLE_STATUSES or attempt >= retry.max_attempts:
+                break
+            await sleep(retry.backoff(attempt))
+
         try:
-            res = APP_STORE_CONVERTER.structure(
-                loads(resp_payload), ResponseBody
-            )
+            return converter.structure(raw, ResponseBody)
         except Exception as exc:
             raise ParseError(resp_payload) from exc
 
-        return res
+    return sender
+
+
+sender = app_store_sender()
+
+
+@attr.s(slots=True, frozen=True)
+class ReceiptVerification:
+    """The result of verifying a receipt: a response, or an error."""
+
+    receipt_b64_data: str = attr.ib()
+    response: Optional[ResponseBody] = attr.ib(default=None)
+    error: Optional[Exception] = attr.ib(default=None)
+
+
+async def verify_receipts(
+    verifier: AppStoreVerifier,
+    receipts: Iterable[str],
+    password: Optional[str] = None,
+    exclude_old_transactions: bool = False,
+    concurrency: int = 32,
+) -> AsyncIterator[ReceiptVerification]:
+    """Verify base64 receipts concurrently.
+
+    At most `concurrency` receipts are verified at once, over the
+    verifier's session. Results are yielded as they finish, so not in
+    order, and failures are captured in their result instead of raised.
+    """
+
+    async def verify(receipt: str) -> ReceiptVerification:
+        try:
+            response = await verifier.verify_receipt(
+                receipt, password, exclude_old_transactions
+            )
+        except Exception as exc:
+            return ReceiptVerification(receipt, error=exc)
+        return ReceiptVerification(receipt, response)
+
+    async for result in bounded_map(verify, receipts, concurrency):
+        yield result
 
 
 async def create_verifier():
@@ -1,17 +1,36 @@
 """Google services."""
-from asyncio import create_task
+from asyncio import Task, create_task, get_running_loop, shield, sleep
+from contextlib import asynccontextmanager
 from enum import IntEnum, unique
-from typing import AsyncContextManager, Dict, List, Optional, Type, TypeVar
+from fcntl import LOCK_EX, flock
+from logging import getLogger
+from time import time
+from typing import (
+    IO,
+    AsyncContextManager,
+    AsyncGenerator,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+)
 
 import attr
 from aiohttp import ClientSession
 from cattr import Converter
 from jwt import encode
 from pendulum import DateTime, from_timestamp
-from ujson import loads
+from ujson import dumps, loads
 
 from pyrseia import ClientAdapter, create_client, rpc
 from pyrseia.aiohttp import aiohttp_client_adapter
+from pyrseia.batch import bounded_map
 from pyrseia.wire import Call
 
 # Scope for purchases: https://www.googleapis.com/auth/androidpublisher
@@ -19,6 +38,12 @@ BASE_URL = "https://www.googleapis.com/androidpublisher/v3/applications"
 ACCESS_TOKEN_GRANT_TYPE = "urn:ietf:params:oauth:grant-type:jwt-bearer"
 SCOPE_ANDROIDPUBLISHER = "https://www.googleapis.com/auth/androidpublisher"
 converter = Converter()
+# Background token refreshes wait at least this long, and back off up to
+# the maximum while they fail.
+MIN_REFRESH_DELAY = 10.0
+MAX_REFRESH_BACKOFF = 300.0
+
+logger = getLogger(__name__)
 
 
 @attr.s(auto_attribs=True)
@@ -196,74 +221,283 @@ async def invoke_api(
         return resp_payload
 
 
+@attr.s(slots=True, frozen=True)
+class FileTokenCache:
+    """Shares access tokens between processes on a host, through a file.
+
+    The file is locked while a token is read or requested, so only one
+    process requests a new token and the others wait for it.
+    """
+
+    path: str = attr.ib()
+
+    async def get(
+        self,
+        request: Callable[[], Awaitable[AccessToken]],
+        min_ttl: float,
+        rejected: Optional[str] = None,
+    ) -> Tuple[AccessToken, float]:
+        """Get a token valid for at least `min_ttl` seconds, and its expiry.
+
+        A cached token that was `rejected` by the API is replaced.
+        """
+        f = await get_running_loop().run_in_executor(None, self._lock)
+        try:
+            f.seek(0)
+            content = f.read()
+            if content:
+                cached = loads(content)
+                token = converter.structure(cached["token"], AccessToken)
+                expires_at = cached["expires_at"]
+                fresh = expires_at - time() > min_ttl
+                if fresh and token.access_token != rejected:
+                    return token, expires_at
+            token = await request()
+            expires_at = time() + token.expires_in
+            f.seek(0)
+            f.truncate()
+            f.write(
+                dumps(
+                    {
+                        "token": converter.unstructure(token),
+                        "expires_at": expires_at,
+                    }
+                )
+            )
+            f.flush()
+            return token, expires_at
+        finally:
+            # Closing the file releases the lock.
+            f.close()
+
+    def _lock(self) -> IO[str]:
+        f = open(self.path, "a+")
+        try:
+            flock(f, LOCK_EX)
+        except BaseException:
+            f.close()
+            raise
+        return f
+
+
+def _request(call: Call) -> Tuple[str, Dict[str, str]]:
+    """The URL and query parameters of a call."""
+    args = call.args
+    if call.name == "get_purchases_products":
+        return (
+            f"{BASE_URL}/{args[0]}/purchases/products/{args[1]}/tokens/{args[2]}",
+            {},
+        )
+    elif call.name == "get_voided_purchases":
+        query_params = {
+            param: str(arg)
+            for param, arg in zip(
+                ("startTime", "endTime", "token", "type"), args[1:]
+            )
+            if arg is not None
+        }
+        return f"{BASE_URL}/{args[0]}/purchases/voidedpurchases", query_params
+    raise ValueError(f"Unknown call: {call.name}")
+
+
 T = TypeVar("T")
 
 
 def google_client_network_adapter(
     creds: ServiceAccountCredentials,
+    refresh_margin: float = 300.0,
+    token_cache: Optional[FileTokenCache] = None,
 ) -> AsyncContextManager[ClientAdapter]:
-    token = None
-    task = None
+    """An adapter for Google APIs, authenticating as a service account.
+
+    Access tokens are refreshed in the background `refresh_margin` seconds
+    before they expire, and failed refreshes are logged and retried with
+    backoff. With a `token_cache`, tokens are shared with other
+    processes using the same cache.
+    """
+    token: Optional[AccessToken] = None
+    task: Optional["Task[AccessToken]"] = None
+    refresher: Optional[Task] = None
+
+    async def fetch_token(
+        session: ClientSession, rejected: Optional[str]
+    ) -> AccessToken:
+        nonlocal token, task, refresher
+        try:
+            if token_cache is not None:
+                new_token, expires_at = await token_cache.get(
+                    lambda: request_access_token(
+                        session, creds.token_uri, creds
+                    ),
+                    refresh_margin,
+                    rejected,
+                )
+            else:
+                new_token = await request_access_token(
+                    session, creds.token_uri, creds
+                )
+                expires_at = time() + new_token.expires_in
+        finally:
+            task = None
+        token = new_token
+        if refresher is not None:
+            refresher.cancel()
+        refresher = create_task(
+            refresh_later(session, expires_at - refresh_margin)
+        )
+        return new_token
+
+    async def refresh(
+        session: ClientSession, rejected: Optional[str] = None
+    ) -> AccessToken:
+        """Get a new token, once for all concurrent callers."""
+        nonlocal task
+        if task is None:
+            task = create_task(fetch_token(session, rejected))
+        return await shield(task)
+
+    async def refresh_later(
+        session: ClientSession, at: float, failures: int = 0
+    ) -> None:
+        nonlocal refresher
+        await sleep(max(MIN_REFRESH_DELAY, at - time()))
+        refresher = None
+        try:
+            await refresh(session)
+        except Exception:
+            logger.exception("Refreshing the access token failed.")
+            backoff = min(
+                MAX_REFRESH_BACKOFF, MIN_REFRESH_DELAY * 2 ** failures
+            )
+            refresher = create_task(
+                refresh_later(session, time() + backoff, failures + 1)
+            )
 
     async def sender(
         session: ClientSession, call: Call, resp_type: Type[T]
     ) -> T:
-        nonlocal task, token
-        if token is None:
-            created_task = False
-            if task is None:
-                created_task = True
-                task = create_task(
-                    request_access_token(session, creds.token_uri, creds)
-                )
-            local_task = task  # 'task' will get cleaned up eventually.
-            await local_task
-            token = local_task.result()
-            if created_task:
-                task = None
-
-        if call.name == "get_purchases_products":
-            url = f"{BASE_URL}/{call.args[0]}/purchases/products/{call.args[1]}/tokens/{call.args[2]}"
-            query_params: Dict[str, str] = {}
-        elif call.name == "get_voided_purchases":
-            url = f"{BASE_URL}/{call.args[0]}/purchases/voidedpurchases"
-            query_params = {}
-            if call.args[1] is not None:
-                query_params["startTime"] = str(call.args[1])
-            if call.args[2] is not None:
-                query_params["endTime"] = str(call.args[2])
-            if call.args[3] is not None:
-                query_params["token"] = str(call.args[3])
-            if call.args[4] is not None:
-                query_params["type"] = str(call.args[4])
+        local_token = token if token is not None else await refresh(session)
+
+        url, query_params = _request(call)
         try:
             resp = await invoke_api(
-                session, token.access_token, url, query_params=query_params
+                session,
+                local_token.access_token,
+                url,
+                query_params=query_params,
             )
         except HttpError as exc:
-            if exc.status_code == 401:
-                # Refresh the access token.
-                if task is not None:
-                    local_task = task
-                    await local_task
-                    local_token = local_task.result()
-                else:
-                    task = create_task(
-                        request_access_token(session, creds.token_uri, creds)
-                    )
-                    await task
-                    local_token = token = task.result()
-                    task = None
-                resp = await invoke_api(session, local_token.access_token, url)
-            else:
+            if exc.status_code != 401:
                 raise
+            # The token was revoked, unless it's been replaced already.
+            if token is not None and token is not local_token:
+                local_token = token
+            else:
+                local_token = await refresh(session, local_token.access_token)
+            resp = await invoke_api(
+                session,
+                local_token.access_token,
+                url,
+                query_params=query_params,
+            )
 
         try:
             return converter.structure(loads(resp), resp_type)
         except Exception as exc:
             raise ParseError(resp) from exc
 
-    return aiohttp_client_adapter("", sender=sender)
+    @asynccontextmanager
+    async def adapter() -> AsyncGenerator[ClientAdapter, None]:
+        try:
+            async with aiohttp_client_adapter("", sender=sender) as inner:
+                yield inner
+        finally:
+            if refresher is not None:
+                refresher.cancel()
+
+    return adapter()
+
+
+@attr.s(slots=True, frozen=True)
+class PurchaseVerification:
+    """The result of verifying a purchase token: a purchase, or an error."""
+
+    package_name: str = attr.ib()
+    product_id: str = attr.ib()
+    token: str = attr.ib()
+    purchase: Optional[ProductPurchase] = attr.ib(default=None)
+    error: Optional[Exception] = attr.ib(default=None)
+
+
+async def verify_purchases(
+    client: GooglePlayDeveloperApi,
+    purchases: Iterable[Tuple[str, str, str]],
+    concurrency: int = 32,
+) -> AsyncIterator[PurchaseVerification]:
+    """Verify `(package name, product ID, token)` purchases concurrently.
+
+    At most `concurrency` requests are in flight at once, over the
+    client's session. Results are yielded as they finish, so not in
+    order, and failures are captured in their result instead of raised.
+    """
+
+    async def verify(
+        package_name: str, product_id: str, token: str
+    ) -> PurchaseVerification:
+        try:
+            purchase = await client.get_purchases_products(
+                package_name, product_id, token
+            )
+        except Exception as exc:
+            return PurchaseVerification(
+                package_name, product_id, token, error=exc
+            )
+        return PurchaseVerification(package_name, product_id, token, purchase)
+
+    async for result in bounded_map(
+        lambda purchase: verify(*purchase), purchases, concurrency
+    ):
+        yield result
+
+
+async def iter_voided_purchases(
+    client: GooglePlayDeveloperApi,
+    package_name: str,
+    start_time: Optional[int] = None,
+    end_time: Optional[int] = None,
+    type: int = 0,
+) -> AsyncIterator[VoidedPurchase]:
+    """Stream voided purchases, following page tokens.
+
+    The next page is fetched while the current one is being consumed, and
+    only these two pages are held at a time.
+    """
+    page = await client.get_voided_purchases(
+        package_name, start_time, end_time, None, type
+    )
+    while True:
+        next_page: Optional["Task[VoidedPurchasesResponse]"] = None
+        if page.tokenPagination is not None:
+            next_page = create_task(
+                client.get_voided_purchases(
+                    package_name,
+                    start_time,
+                    end_time,
+                    page.tokenPagination.nextPageToken,
+                    type,
+                )
+            )
+        try:
+            for purchase in page.voidedPurchases:
+                yield purchase
+        except BaseException:
+            # Including the iterator being closed early.
+            if next_page is not None:
+                next_page.cancel()
+            raise
+        if next_page is None:
+            return
+        page = await next_page
 
 
 async def create_google_client():
@@ -1,8 +1,42 @@
 # flake8: noqa
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+from ._api import idempotent as idempotent
+from ._api import notification as notification
+from ._api import priority as priority
 from ._api import rpc as rpc
-from ._client import ClientAdapter as ClientAdapter
-from ._client import close_client as close_client
-from ._client import create_client as create_client
-from ._server import NextMiddleware as NextMiddleware
-from ._server import Server as Server
-from ._server import server as server
+
+if TYPE_CHECKING:
+    from ._client import ClientAdapter as ClientAdapter
+    from ._client import close_client as close_client
+    from ._client import create_client as create_client
+    from ._server import NextMiddleware as NextMiddleware
+    from ._server import NotificationQueue as NotificationQueue
+    from ._server import ScopedMiddleware as ScopedMiddleware
+    from ._server import Server as Server
+    from ._server import scoped as scoped
+    from ._server import server as server
+
+# Clients and servers pull in attrs and cattrs, so they're imported on
+# first use. Defining APIs with `rpc` stays cheap.
+_LAZY = {
+    "ClientAdapter": "._client",
+    "close_client": "._client",
+    "create_client": "._client",
+    "NextMiddleware": "._server",
+    "NotificationQueue": "._server",
+    "ScopedMiddleware": "._server",
+    "Server": "._server",
+    "scoped": "._server",
+    "server": "._server",
+}
+
+
+def __getattr__(name: str) -> Any:
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
@@ -1,34 +1,50 @@
+import sys
 from asyncio import run
 from importlib import import_module
 from inspect import getmodule
+from typing import Any, List, Optional, Tuple
 
 import typer
 
-from . import close_client
+# Everything else is imported by the commands that need it, for a quick
+# startup.
 
+app = typer.Typer()
 
-def main(
+
+def _parse_invocation(invocation: str) -> Tuple[str, List[str]]:
+    invocation_parts = invocation.split("(")
+    method = invocation_parts[0]
+    args = [p.strip() for p in invocation_parts[1].split(")")[0].split(",")]
+    return method, [arg for arg in args if arg]
+
+
+async def _create_client(client_factory: str) -> Any:
+    client_factory_module, factory_name = client_factory.split(":")
+    mod = import_module(client_factory_module)
+    factory = getattr(mod, factory_name)
+    return await factory()
+
+
+def _eval_args(client: Any, args: List[str]) -> List[Any]:
+    api_module = getmodule(client.__class__.__bases__[0])
+    return [eval(arg, vars(api_module), {}) for arg in args]
+
+
+@app.command()
+def call(
     client_factory: str,
     invocation: str,
     interactive: bool = typer.Option(False, "--interactive", "-i"),
 ):
     """Invoke a client method and print the result."""
-    client_factory_module, factory_name = client_factory.split(":")
+    from . import close_client
 
-    async def call():
-        mod = import_module(client_factory_module)
-        factory = getattr(mod, factory_name)
-
-        invocation_parts = invocation.split("(")
-        method = invocation_parts[0]
-        args = [
-            p.strip() for p in invocation_parts[1].split(")")[0].split(",")
-        ]
-
-        client = await factory()
-        api_module = getmodule(client.__class__.__bases__[0])
+    method, args = _parse_invocation(invocation)
 
-        evald_args = [eval(arg, vars(api_module), {}) for arg in args]
+    async def call():
+        client = await _create_client(client_factory)
+        evald_args = _eval_args(client, args)
         res = await getattr(client, method)(*evald_args)
         await close_client(client)
         if interactive:
@@ -40,5 +56,112 @@ def main(
     run(call())
 
 
+@app.command()
+def bench(
+    client_factory: str,
+    invocation: str,
+    concurrency: int = typer.Option(1, "--concurrency", "-c"),
+    rate: Optional[float] = typer.Option(None, "--rate", "-r"),
+    duration: float = typer.Option(10.0, "--duration", "-d"),
+):
+    """Invoke a client method repeatedly and report latencies.
+
+    Without a rate, CONCURRENCY callers invoke the method in a loop. With a
+    rate, calls start at a fixed rate per second, with at most CONCURRENCY
+    in flight.
+    """
+    from . import close_client
+    from ._bench import generate_load
+
+    method, args = _parse_invocation(invocation)
+
+    async def bench():
+        client = await _create_client(client_factory)
+        evald_args = _eval_args(client, args)
+        fn = getattr(client, method)
+        try:
+            report = await generate_load(
+                lambda: fn(*evald_args), duration, concurrency, rate
+            )
+        finally:
+            await close_client(client)
+        print(report.format())
+
+    run(bench())
+
+
+@app.command()
+def replay(
+    log: str,
+    client_factory: str,
+    speed: float = typer.Option(1.0, "--speed", "-s"),
+    max_speed: bool = typer.Option(False, "--max"),
+    concurrency: int = typer.Option(64, "--concurrency", "-c"),
+):
+    """Replay a captured traffic log, and compare latencies.
+
+    Calls are replayed at their original pace divided by SPEED, or as fast
+    as possible with --max.
+    """
+    from . import close_client
+    from .capture import read_log
+    from .capture import replay as replay_log
+
+    async def replay():
+        client = await _create_client(client_factory)
+
+        async def call(name, args):
+            return await getattr(client, name)(*args)
+
+        try:
+            res = await replay_log(
+                read_log(log),
+                call,
+                None if max_speed else speed,
+                concurrency,
+            )
+        finally:
+            await close_client(client)
+
+        print(
+            f"{'Method':<32} {'Calls':>8} {'Errors':>8}"
+            f" {'Recorded p50/p99 (ms)':>24} {'Replayed p50/p99 (ms)':>24}"
+        )
+        for name, c in sorted(res.items()):
+            recorded = (
+                f"{c.recorded.percentile(50) * 1000:.3f}"
+                f"/{c.recorded.percentile(99) * 1000:.3f}"
+            )
+            replayed = (
+                f"{c.replayed.percentile(50) * 1000:.3f}"
+                f"/{c.replayed.percentile(99) * 1000:.3f}"
+            )
+            print(
+                f"{name:<32} {c.recorded.count:>8} {c.errors:>8}"
+                f" {recorded:>24} {replayed:>24}"
+            )
+
+    run(replay())
+
+
+def _default_to_call(argv: List[str]) -> List[str]:
+    """Run `call` for the original `module:factory "method(args)"` form."""
+    commands = {
+        command.name or command.callback.__name__  # type: ignore
+        for command in app.registered_commands
+    }
+    for arg in argv:
+        if arg.startswith("-"):
+            continue
+        if arg not in commands:
+            return ["call"] + argv
+        break
+    return argv
+
+
+def main() -> None:
+    app(_default_to_call(sys.argv[1:]))
+
+
 if __name__ == "__main__":
-    typer.run(main)
+    main()
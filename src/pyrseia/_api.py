@@ -1,4 +1,13 @@
-from typing import Any, Callable, Coroutine, Generic, TypeVar, overload
+from inspect import getfullargspec
+from typing import (
+    Any,
+    Callable,
+    Coroutine,
+    Generic,
+    Optional,
+    TypeVar,
+    overload,
+)
 
 RR = TypeVar("RR")
 RT = TypeVar("RT")
@@ -98,3 +107,55 @@ def rpc(
 def rpc(func):
     func.__is_rpc = True  # type: ignore
     return func  # type: ignore
+
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+def notification(func: F) -> F:
+    """Mark an RPC method as a one-way notification.
+
+    Servers acknowledge notifications right away and run them in the
+    background, so they must return None. By then the request has been
+    answered, so handlers should only use its headers and other data
+    already parsed from it, not its body.
+    """
+    if getfullargspec(func).annotations.get("return") is not None:
+        raise TypeError("Notifications must return None.")
+    func.__is_notification = True  # type: ignore
+    return func
+
+
+def is_notification(func: Callable) -> bool:
+    return hasattr(func, "__is_notification")
+
+
+def idempotent(func: F) -> F:
+    """Mark an RPC method as safe to call any number of times.
+
+    Clients created with `single_flight` share one call between identical
+    concurrent calls of these methods.
+    """
+    func.__is_idempotent = True  # type: ignore
+    return func
+
+
+def is_idempotent(func: Callable) -> bool:
+    return hasattr(func, "__is_idempotent")
+
+
+def priority(cls: str) -> Callable[[F], F]:
+    """Put an RPC method into a priority class.
+
+    Servers with a `FairScheduler` share their capacity between classes.
+    """
+
+    def wrapper(func: F) -> F:
+        func.__rpc_priority = cls  # type: ignore
+        return func
+
+    return wrapper
+
+
+def get_priority(func: Callable) -> Optional[str]:
+    return getattr(func, "__rpc_priority", None)
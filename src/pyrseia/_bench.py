@@ -0,0 +1,139 @@
+"""Load generation and latency reporting for the CLI."""
+from asyncio import Semaphore, Task, create_task, gather, sleep
+from collections import Counter
+from time import perf_counter
+from typing import Any, Awaitable, Callable, Optional, Set
+
+import attr
+
+PERCENTILES = (50.0, 75.0, 90.0, 99.0, 99.9, 99.99, 100.0)
+
+
+@attr.s(slots=True)
+class LatencyHistogram:
+    """A log-linear latency histogram, in the style of HdrHistogram.
+
+    Latencies are recorded in microseconds, rounded down to
+    `significant_bits` significant bits.
+    """
+
+    significant_bits: int = attr.ib(default=7)
+    count: int = attr.ib(init=False, default=0)
+    total: float = attr.ib(init=False, default=0.0)
+    max: float = attr.ib(init=False, default=0.0)
+    _counts: "Counter[int]" = attr.ib(init=False, factory=Counter)
+
+    def record(self, seconds: float) -> None:
+        us = int(seconds * 1_000_000)
+        shift = max(0, us.bit_length() - self.significant_bits)
+        self._counts[(us >> shift) << shift] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p: float) -> float:
+        """The latency at a percentile, in seconds."""
+        if p >= 100.0:
+            return self.max
+        target = self.count * p / 100
+        seen = 0
+        for us, count in sorted(self._counts.items()):
+            seen += count
+            if seen >= target:
+                return us / 1_000_000
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+@attr.s(slots=True)
+class LoadReport:
+    seconds: float = attr.ib()
+    histogram: LatencyHistogram = attr.ib(factory=LatencyHistogram)
+    errors: "Counter[str]" = attr.ib(factory=Counter)
+
+    @property
+    def calls(self) -> int:
+        return self.histogram.count + sum(self.errors.values())
+
+    def format(self) -> str:
+        h = self.histogram
+        lines = [
+            f"Calls:      {self.calls}",
+            f"Errors:     {sum(self.errors.values())}",
+            f"Duration:   {self.seconds:.2f}s",
+            f"Throughput: {self.calls / self.seconds:.1f} calls/s",
+        ]
+        for name, count in self.errors.most_common():
+            lines.append(f"  {name}: {count}")
+        lines.append("")
+        lines.append(f"Latency (ms), mean {h.mean * 1000:.3f}:")
+        for p in PERCENTILES:
+            lines.append(f"  {p:>7.3f}%  {h.percentile(p) * 1000:>10.3f}")
+        return "\n".join(lines)
+
+
+async def generate_load(
+    fn: Callable[[], Awaitable[Any]],
+    duration: float,
+    concurrency: int = 1,
+    rate: Optional[float] = None,
+) -> LoadReport:
+    """Call `fn` repeatedly for `duration` seconds.
+
+    Without a `rate`, `concurrency` callers call in a loop. With a rate,
+    calls start at fixed intervals with at most `concurrency` in flight,
+    and latencies are measured from when each call should have started
+    so stalls aren't hidden.
+    """
+    report = LoadReport(duration)
+
+    async def one(start: float) -> None:
+        try:
+            await fn()
+        except Exception as exc:
+            report.errors[type(exc).__name__] += 1
+        else:
+            report.histogram.record(perf_counter() - start)
+
+    begin = perf_counter()
+    deadline = begin + duration
+
+    if rate is None:
+
+        async def worker() -> None:
+            while perf_counter() < deadline:
+                await one(perf_counter())
+
+        await gather(*(worker() for _ in range(concurrency)))
+    else:
+        interval = 1 / rate
+        slots = Semaphore(concurrency)
+        tasks: Set[Task] = set()
+
+        async def limited(start: float) -> None:
+            try:
+                await one(start)
+            finally:
+                slots.release()
+
+        i = 0
+        while True:
+            start = begin + i * interval
+            if start >= deadline:
+                break
+            delay = start - perf_counter()
+            if delay > 0:
+                await sleep(delay)
+            await slots.acquire()
+            task = create_task(limited(start))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            i += 1
+        await gather(*tasks)
+
+    report.seconds = perf_counter() - begin
+    return report
@@ -1,14 +1,24 @@
+from asyncio import Task, create_task, shield
+from functools import partial, wraps
 from inspect import getfullargspec
-from typing import AsyncContextManager, Awaitable, Callable, Type, TypeVar
+from typing import (
+    Any,
+    AsyncContextManager,
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+)
 from weakref import WeakKeyDictionary
 
-from cattr import Converter
-from wrapt import decorator  # type: ignore
-
+from ._api import is_idempotent, is_notification
+from .cache import CachePolicy, ResponseCache, get_cache_policy
 from .wire import Call
 
-converter = Converter()
-
 T = TypeVar("T")
 ClientAdapter = Callable[[Call, Type[T]], Awaitable[T]]
 
@@ -16,35 +26,115 @@ _clients: WeakKeyDictionary = WeakKeyDictionary()
 
 
 async def create_client(
-    api: Type[T], network_adapter: AsyncContextManager[ClientAdapter]
+    api: Type[T],
+    network_adapter: AsyncContextManager[ClientAdapter],
+    cache: Optional[ResponseCache] = None,
+    single_flight: bool = False,
 ) -> T:
+    """Create a client for an API.
+
+    If `single_flight` is set, identical concurrent calls of `idempotent`
+    methods share a single network request and its result.
+    """
+
     class Client(api):  # type: ignore
         pass
 
     sender = await network_adapter.__aenter__()
+    in_flight: Optional[Dict[Hashable, Task]] = {} if single_flight else None
 
     for name in dir(Client):
         obj = getattr(Client, name)
         if hasattr(obj, "__is_rpc"):
-            setattr(Client, name, _adjust_rpc(obj, sender))
+            setattr(
+                Client, name, _adjust_rpc(obj, sender, cache, in_flight)
+            )
 
     res = Client()
-    _clients[res] = network_adapter
+    _clients[res] = (network_adapter, cache)
     return res
 
 
 async def close_client(client):
-    await _clients[client].__aexit__(None, None, None)
-
-
-def _adjust_rpc(coro, sender: ClientAdapter):
+    network_adapter, cache = _clients[client]
+    if cache is not None:
+        cache.close()
+    await network_adapter.__aexit__(None, None, None)
+
+
+def _adjust_rpc(
+    coro,
+    sender: ClientAdapter,
+    cache: Optional[ResponseCache] = None,
+    in_flight: Optional[Dict[Hashable, Task]] = None,
+):
     argspec = getfullargspec(coro)
     return_type = argspec.annotations["return"]
-
-    @decorator
-    async def wrapper(wrapped, instance, args, kwargs):
-        call = Call(coro.__name__, args)
-        resp = await sender(call, return_type)
-        return resp
-
-    return wrapper(coro)
+    name = coro.__name__
+    qualname = coro.__qualname__
+    cache_policy = get_cache_policy(coro)
+
+    async def send(args):
+        return await sender(Call(name, args), return_type)
+
+    if is_notification(coro) or not is_idempotent(coro):
+        # Sharing a call would drop the side effects of the others.
+        in_flight = None
+
+    if in_flight is not None:
+        send = _single_flight(send, qualname, in_flight)
+    if cache is not None and cache_policy is not None:
+        send = _cached(send, qualname, cache, cache_policy)
+
+    @wraps(coro)
+    async def wrapper(self, *args):
+        return await send(args)
+
+    return wrapper
+
+
+def _call_key(qualname: str, args: Tuple[Any, ...]) -> Hashable:
+    """A key identifying a call by its arguments.
+
+    1, 1.0 and True are equal and hash alike, so their types are part of
+    the key.
+    """
+    return (qualname, args, tuple(type(arg) for arg in args))
+
+
+def _single_flight(send, qualname: str, in_flight: Dict[Hashable, Task]):
+    """Share a single in-flight call between identical calls."""
+
+    def done(key, task: Task) -> None:
+        del in_flight[key]
+        if not task.cancelled():
+            # Retrieve the exception, in case all callers went away.
+            task.exception()
+
+    async def coalesced(args):
+        key = _call_key(qualname, args)
+        try:
+            task = in_flight.get(key)
+        except TypeError:
+            # Unhashable arguments can't be coalesced.
+            return await send(args)
+        if task is None:
+            task = in_flight[key] = create_task(send(args))
+            task.add_done_callback(partial(done, key))
+        # Callers going away shouldn't cancel the call for everyone else.
+        return await shield(task)
+
+    return coalesced
+
+
+def _cached(send, qualname: str, cache: ResponseCache, policy: CachePolicy):
+    async def cached(args):
+        key = _call_key(qualname, args)
+        try:
+            hash(key)
+        except TypeError:
+            # Unhashable arguments can't be cached.
+            return await send(args)
+        return await cache.get_or_load(key, policy, lambda: send(args))
+
+    return cached
@@ -1,4 +1,7 @@
+from asyncio import CancelledError, Queue, Task, create_task, gather
 from inspect import getfullargspec
+from logging import getLogger
+from time import perf_counter, time
 from typing import (
     Any,
     Awaitable,
@@ -9,6 +12,8 @@ from typing import (
     List,
     Optional,
     Sequence,
+    Set,
+    Tuple,
     Type,
     TypeVar,
     Union,
@@ -16,7 +21,6 @@ from typing import (
 )
 
 import attr
-from wrapt import decorator  # type: ignore
 
 from ._api import (
     RpcCallable0,
@@ -25,7 +29,12 @@ from ._api import (
     RpcCallable3,
     RpcCallable4,
     RpcCallable5,
+    get_priority,
+    is_notification,
 )
+from .scheduling import FairScheduler
+from .timing import StageTimings, current_timings
+from .tracing import Span, SpanKind, Tracer, current_span, current_tracer
 from .wire import Call
 
 CT = TypeVar("CT")
@@ -44,31 +53,95 @@ ServerOutputAdapter = Callable[[Any], Awaitable]
 NextMiddleware = Callable[[CTXT, Call], Awaitable[Any]]
 Middleware = Callable[[CTXT, Call, NextMiddleware[CTXT]], Any]
 
+logger = getLogger(__name__)
+
 
 @attr.s(slots=True, frozen=True)
-class Server(Generic[CT, CTXT]):
-    _registry: Dict[str, Callable] = attr.ib(factory=dict, init=False)
-    _middleware: Sequence[Middleware] = attr.ib(factory=list)
-    _middleware_chain: Optional[
-        Callable[[CTXT, Call], Awaitable[Any]]
-    ] = attr.ib(init=False, repr=False, default=None)
+class ScopedMiddleware(Generic[CTXT]):
+    """A middleware wrapping only the methods it applies to."""
+
+    middleware: Middleware[CTXT] = attr.ib()
+    applies: Callable[[str], bool] = attr.ib()
+
+
+def scoped(
+    middleware: Middleware[CTXT],
+    *methods: Union[str, Callable],
+    predicate: Optional[Callable[[str], bool]] = None,
+) -> ScopedMiddleware[CTXT]:
+    """Apply a middleware only to some methods.
+
+    Methods can be given by name or as API methods, and/or matched by a
+    predicate on their names.
+    """
+    names = frozenset(m if isinstance(m, str) else m.__name__ for m in methods)
+    if predicate is None:
+        if not names:
+            raise ValueError("No methods or predicate given.")
+        return ScopedMiddleware(middleware, names.__contains__)
+    if not names:
+        return ScopedMiddleware(middleware, predicate)
+    pred = predicate
+    return ScopedMiddleware(middleware, lambda n: n in names or pred(n))
+
+
+Dispatch = Callable[[CTXT, Call], Awaitable[Any]]
 
-    def __attrs_post_init__(self):
-        if self._middleware:
 
-            async def next_call(req_ctx, call):
-                handler = self._registry[call.name]
-                return await handler(req_ctx, *call.args)
+@attr.s(slots=True, frozen=True)
+class _Link(Generic[CTXT]):
+    """A middleware, bound to the rest of its chain."""
+
+    middleware: Middleware[CTXT] = attr.ib()
+    next: Dispatch[CTXT] = attr.ib()
+
+    def __call__(self, req_ctx: CTXT, call: Call) -> Awaitable[Any]:
+        return self.middleware(req_ctx, call, self.next)
+
 
-            n = next_call
+@attr.s(slots=True, frozen=True)
+class Server(Generic[CT, CTXT]):
+    _middleware: Sequence[
+        Union[Middleware, ScopedMiddleware]
+    ] = attr.ib(factory=list)
+    _scheduler: Optional[FairScheduler[CTXT]] = attr.ib(default=None)
+    # Method names to their argument adapter, middleware and handler,
+    # composed when the method is implemented.
+    _dispatch: Dict[str, Dispatch[CTXT]] = attr.ib(
+        factory=dict, init=False, repr=False
+    )
+    # Methods with middleware.
+    _chained: Set[str] = attr.ib(factory=set, init=False, repr=False)
+    _notifications: Set[str] = attr.ib(factory=set, init=False)
+    _priorities: Dict[str, str] = attr.ib(factory=dict, init=False)
 
-            for mid in reversed(self._middleware):
+    def _compose(self, name: str, handler: Dispatch[CTXT]) -> Dispatch[CTXT]:
+        middleware = []
+        for mid in self._middleware:
+            if isinstance(mid, ScopedMiddleware):
+                if not mid.applies(name):
+                    continue
+                mid = mid.middleware
+            middleware.append(mid)
+        if not middleware:
+            self._chained.discard(name)
+            return handler
+        self._chained.add(name)
 
-                async def next_call(req_ctx, call, _n=n, middleware=mid):  # type: ignore
-                    return await middleware(req_ctx, call, _n)
+        async def timed_handler(req_ctx, call):
+            timings = current_timings.get()
+            if timings is None:
+                return await handler(req_ctx, call)
+            start = perf_counter()
+            try:
+                return await handler(req_ctx, call)
+            finally:
+                timings.handler += perf_counter() - start
 
-                n = next_call
-            object.__setattr__(self, "_middleware_chain", n)
+        n: Dispatch[CTXT] = timed_handler
+        for mid in reversed(middleware):
+            n = _Link(mid, n)
+        return n
 
     @overload
     def implement(
@@ -189,27 +262,180 @@ class Server(Generic[CT, CTXT]):
             # include the 'self'.
             if len(s.args) < len(c.args):
                 # We're *not* injecting the request context as the first arg.
-                @decorator
-                async def ctx_wrapper(wrapper, instance, args, kwargs):
-                    return await wrapper(*args[1:], **kwargs)
+                def handler(req_ctx, call):
+                    return server_coro(*call.args)
+
+            else:
+
+                def handler(req_ctx, call):
+                    return server_coro(req_ctx, *call.args)
 
-                server_coro = ctx_wrapper(server_coro)
-            self._registry[client_method.__name__] = server_coro
+            name = client_method.__name__
+            self._dispatch[name] = self._compose(name, handler)
+            if is_notification(client_method):
+                self._notifications.add(client_method.__name__)
+            cls = get_priority(client_method)
+            if cls is not None:
+                self._priorities[name] = cls
             return server_coro
 
         return wrapper
 
-    async def process(self, call: Call, req_ctx: CTXT) -> Any:
-        handler = self._registry.get(call.name)
-        if handler is None:
+    async def process(
+        self, call: Call, req_ctx: CTXT, timings: Optional[StageTimings] = None
+    ) -> Any:
+        dispatch = self._dispatch.get(call.name)
+        if dispatch is None:
             raise ValueError("Handler not found.")
 
-        if self._middleware_chain is not None:
-            res = await self._middleware_chain(req_ctx, call)
+        scheduler = self._scheduler
+        if scheduler is not None:
+            if timings is None and scheduler.try_acquire():
+                # Admitted right away, no need to classify the call.
+                try:
+                    return await dispatch(req_ctx, call)
+                finally:
+                    scheduler.release()
+            return await self._process_scheduled(
+                scheduler, dispatch, call, req_ctx, timings
+            )
+
+        if timings is not None:
+            return await self._process_timed(dispatch, call, req_ctx, timings)
+
+        return await dispatch(req_ctx, call)
+
+    async def _process_scheduled(
+        self,
+        scheduler: FairScheduler[CTXT],
+        dispatch: Dispatch[CTXT],
+        call: Call,
+        req_ctx: CTXT,
+        timings: Optional[StageTimings],
+    ) -> Any:
+        cls = None
+        if scheduler.classify is not None:
+            cls = scheduler.classify(req_ctx, call)
+        if cls is None:
+            cls = self._priorities.get(call.name, scheduler.default_class)
+        start = perf_counter() if timings is not None else 0.0
+        tracer = current_tracer.get()
+        if tracer is None:
+            await scheduler.acquire(cls)
         else:
-            res = await handler(req_ctx, *call.args)
+            parent = current_span.get()
+            async with tracer.span(
+                call.name,
+                SpanKind.QUEUE,
+                parent.context if parent is not None else None,
+            ):
+                await scheduler.acquire(cls)
+        try:
+            if timings is None:
+                return await dispatch(req_ctx, call)
+            timings.queue = perf_counter() - start
+            return await self._process_timed(dispatch, call, req_ctx, timings)
+        finally:
+            scheduler.release()
+
+    async def _process_timed(
+        self,
+        dispatch: Dispatch[CTXT],
+        call: Call,
+        req_ctx: CTXT,
+        timings: StageTimings,
+    ) -> Any:
+        start = perf_counter()
+        try:
+            if call.name in self._chained:
+                token = current_timings.set(timings)
+                try:
+                    return await dispatch(req_ctx, call)
+                finally:
+                    current_timings.reset(token)
+            else:
+                try:
+                    return await dispatch(req_ctx, call)
+                finally:
+                    timings.handler = perf_counter() - start
+        finally:
+            timings.middleware = perf_counter() - start - timings.handler
+
+    def is_notification(self, name: str) -> bool:
+        return name in self._notifications
+
+
+# A queued call, its request context, the current span and the time.
+_Queued = Tuple[Call, CTXT, Optional[Span], float]
+
+
+@attr.s(slots=True)
+class NotificationQueue(Generic[CTXT]):
+    """Runs notifications in the background, on a pool of worker tasks.
+
+    Putting a call into a full queue waits until there's room.
+
+    Handlers get the request context the notification was put with, but
+    the request has been answered by the time they run. Data already
+    parsed from it, like headers, can still be used. Its body and
+    connection can't.
+    """
+
+    _server: Server[Any, CTXT] = attr.ib()
+    maxsize: int = attr.ib(default=1024)
+    workers: int = attr.ib(default=4)
+    tracer: Optional[Tracer] = attr.ib(default=None)
+    _queue: Optional["Queue[_Queued[CTXT]]"] = attr.ib(
+        init=False, default=None
+    )
+    _tasks: List[Task] = attr.ib(init=False, factory=list)
+
+    async def put(self, call: Call, req_ctx: CTXT) -> None:
+        if self._queue is None:
+            # Started lazily, so the queue is bound to the running loop.
+            self._queue = Queue(self.maxsize)
+            self._tasks = [
+                create_task(self._work(self._queue))
+                for _ in range(self.workers)
+            ]
+        await self._queue.put((call, req_ctx, current_span.get(), time()))
+
+    async def close(self) -> None:
+        """Wait for queued notifications to finish, and stop the workers."""
+        if self._queue is None:
+            return
+        await self._queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await gather(*self._tasks, return_exceptions=True)
+        self._queue = None
+        self._tasks = []
 
-        return res
+    async def _work(self, queue: "Queue[_Queued[CTXT]]") -> None:
+        # Workers run in their own contexts, so this is theirs alone.
+        current_tracer.set(self.tracer)
+        while True:
+            call, req_ctx, parent, enqueued_at = await queue.get()
+            try:
+                if self.tracer is None:
+                    await self._server.process(call, req_ctx)
+                else:
+                    parent_ctx = parent.context if parent is not None else None
+                    self.tracer.end_span(
+                        self.tracer.start_span(
+                            call.name, SpanKind.QUEUE, parent_ctx, enqueued_at
+                        )
+                    )
+                    async with self.tracer.span(
+                        call.name, SpanKind.HANDLER, parent_ctx
+                    ):
+                        await self._server.process(call, req_ctx)
+            except CancelledError:
+                raise
+            except Exception:
+                logger.exception("Notification %s failed.", call.name)
+            finally:
+                queue.task_done()
 
 
 T = TypeVar("T")
@@ -219,6 +445,9 @@ def server(
     client: Type[T],
     ctx_cls: Union[Type[CTXT], Type[None]] = type(None),
     *,
-    middleware: List[Middleware[CTXT]] = [],
+    middleware: List[
+        Union[Middleware[CTXT], ScopedMiddleware[CTXT]]
+    ] = [],
+    scheduler: Optional[FairScheduler[CTXT]] = None,
 ) -> Server[T, CTXT]:
-    return Server(middleware=middleware)
+    return Server(middleware=middleware, scheduler=scheduler)
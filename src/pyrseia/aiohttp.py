@@ -11,16 +11,35 @@ from typing import (
 )
 
 from aiohttp import ClientSession, ClientTimeout
-from aiohttp.web import Application, Request, Response, post
-from cattr import Converter
+from aiohttp.web import Application, Request, Response, get, post
 from msgpack import dumps, loads
 from functools import partial
 
 from . import ClientAdapter
-from ._server import Server
-from .wire import Call
-
-converter = Converter()
+from ._server import NotificationQueue, Server
+from .compression import (
+    ACCEPT_ENCODING,
+    CONTENT_ENCODING,
+    IDENTITY,
+    BodyTooLargeError,
+    Compression,
+    RequestEncoder,
+    UnsupportedEncodingError,
+)
+from .metrics import CONTENT_TYPE, Metrics
+from .profiling import CONTENT_TYPE as PROFILE_CONTENT_TYPE
+from .profiling import SamplingProfiler
+from .timing import StageTimings, TimingHook, stage_clock
+from .tracing import (
+    TRACEPARENT,
+    SpanContext,
+    SpanKind,
+    Tracer,
+    aiohttp_span_key,
+    trace_headers,
+    traced_process,
+)
+from .wire import Call, converter
 
 T = TypeVar("T")
 
@@ -31,24 +50,104 @@ def aiohttp_client_adapter(
     sender: Optional[
         Callable[[ClientSession, Call, Type[T]], Awaitable[T]]
     ] = None,
+    timing_hook: Optional[TimingHook] = None,
+    compression: Optional[Compression] = None,
 ) -> AsyncContextManager[ClientAdapter]:
+    """An aiohttp client adapter.
+
+    With `compression`, compressed responses are accepted, and requests
+    are compressed once the server has advertised a codec. A call the
+    server refuses with a 415 for a codec it has dropped is sent again
+    once, encoded for the codecs it accepts now. It doesn't apply to
+    custom senders.
+    """
+    encoder = (
+        RequestEncoder(compression) if compression is not None else None
+    )
+    # We decompress responses ourselves, off the loop if they're large.
+    auto_decompress = sender is not None or compression is None
+
     if sender is None:
         client_timeout = ClientTimeout(total=timeout)
+        hook = timing_hook
+        clock = stage_clock(hook)
 
         async def s(session, call, type):
-            async with session.post(
-                url,
-                data=dumps(converter.unstructure(call)),
-                timeout=client_timeout,
-            ) as resp:
-                return converter.structure(loads(await resp.read()), type)
+            t0 = clock()
+            raw = converter.unstructure(call)
+            t1 = clock()
+            plain = payload = dumps(raw)
+            trace = headers = trace_headers()
+            if encoder is not None:
+                payload, headers = await encoder.encode(payload, trace)
+            t2 = clock()
+            resp = await session.post(
+                url, data=payload, timeout=client_timeout, headers=headers,
+            )
+            if encoder is not None:
+                encoder.update(resp.status, resp.headers.get(ACCEPT_ENCODING))
+                sent = resp.request_info.headers
+                if resp.status == 415 and CONTENT_ENCODING in sent:
+                    # The server has dropped our codec, so send the call
+                    # again, encoded for what it accepts now.
+                    resp.release()
+                    payload, headers = await encoder.encode(plain, trace)
+                    resp = await session.post(
+                        url,
+                        data=payload,
+                        timeout=client_timeout,
+                        headers=headers,
+                    )
+                if resp.status == 415:
+                    resp.release()
+                    raise UnsupportedEncodingError(
+                        resp.request_info.headers.get(
+                            CONTENT_ENCODING, IDENTITY
+                        )
+                    )
+            async with resp:
+                t3 = clock()
+                if resp.status == 202:
+                    # A notification, there is no body.
+                    if hook is not None:
+                        hook(
+                            StageTimings(
+                                call.name,
+                                unstructure=t1 - t0,
+                                dumps=t2 - t1,
+                                write=t3 - t2,
+                            )
+                        )
+                    return None
+                body = await resp.read()
+                if compression is not None:
+                    body = await compression.decompress(
+                        body, resp.headers.get(CONTENT_ENCODING)
+                    )
+            t4 = clock()
+            raw = loads(body)
+            t5 = clock()
+            res = converter.structure(raw, type)
+            if hook is not None:
+                hook(
+                    StageTimings(
+                        call.name,
+                        read=t4 - t3,
+                        loads=t5 - t4,
+                        structure=clock() - t5,
+                        unstructure=t1 - t0,
+                        dumps=t2 - t1,
+                        write=t3 - t2,
+                    )
+                )
+            return res
 
     else:
         s = sender
 
     @asynccontextmanager
     async def aiohttp_adapter() -> AsyncGenerator[ClientAdapter, None]:
-        session = ClientSession()
+        session = ClientSession(auto_decompress=auto_decompress)
 
         try:
             yield partial(s, session)
@@ -58,18 +157,140 @@ def aiohttp_client_adapter(
     return aiohttp_adapter()
 
 
+# aiohttp's HTTP parser decodes these itself, bounded by the app's
+# client_max_size rather than by `Compression.max_decompressed_size`.
+_PARSER_DECODED = frozenset(("gzip", "deflate", "br", "zstd"))
+
+
+async def _read_request(compression: Compression, request: Request) -> bytes:
+    body = await request.read()
+    coding = request.headers.get(CONTENT_ENCODING)
+    if coding is None or coding.strip().lower() in _PARSER_DECODED:
+        return body
+    return await compression.decompress(body, coding)
+
+
 def create_aiohttp_app(
-    serv: Server[Any, Request], route: str = "/"
+    serv: Server[Any, Request],
+    route: str = "/",
+    notification_queue_size: int = 1024,
+    notification_workers: int = 4,
+    metrics: Optional[Metrics] = None,
+    metrics_route: str = "/metrics",
+    timing_hook: Optional[TimingHook] = None,
+    profiler: Optional[SamplingProfiler] = None,
+    profiler_route: str = "/debug/profile",
+    tracer: Optional[Tracer] = None,
+    compression: Optional[Compression] = None,
 ) -> Application:
-    def input_adapter(payload: bytes) -> Call:
-        return converter.structure(loads(payload), Call)
+    notifications = NotificationQueue(
+        serv, notification_queue_size, notification_workers, tracer
+    )
+    process: Callable[..., Awaitable[Any]] = serv.process
+    if tracer is not None:
+        process = traced_process(tracer, serv.process)
+
+    hook = timing_hook
+    clock = stage_clock(hook)
 
     async def handler(request: Request) -> Response:
-        call = input_adapter(await request.read())
-        resp = await serv.process(call, request)
-        return Response(body=dumps(converter.unstructure(resp)))
+        t0 = clock()
+        if compression is not None:
+            try:
+                payload = await _read_request(compression, request)
+            except UnsupportedEncodingError:
+                return Response(
+                    status=415,
+                    headers={ACCEPT_ENCODING: compression.accept_encoding},
+                )
+            except BodyTooLargeError:
+                return Response(status=413)
+        else:
+            payload = await request.read()
+        t1 = clock()
+        raw = loads(payload)
+        t2 = clock()
+        call = converter.structure(raw, Call)
+        t3 = clock()
+        timings = None
+        if hook is not None:
+            timings = StageTimings(
+                call.name, read=t1 - t0, loads=t2 - t1, structure=t3 - t2
+            )
+
+        if serv.is_notification(call.name):
+            await notifications.put(call, request)
+            resp = Response(status=202)
+        else:
+            res = await process(call, request, timings)
+            t4 = clock()
+            raw = converter.unstructure(res)
+            t5 = clock()
+            body = dumps(raw)
+            headers = None
+            if compression is not None:
+                body, headers = await compression.encode_response(
+                    body, request.headers.get(ACCEPT_ENCODING)
+                )
+            resp = Response(body=body, headers=headers)
+            if timings is not None:
+                timings.unstructure = t5 - t4
+                timings.dumps = clock() - t5
+
+        if hook is None or timings is None:
+            return resp
+        # Write the response here, to time it.
+        t6 = clock()
+        await resp.prepare(request)
+        await resp.write_eof()
+        timings.write = clock() - t6
+        hook(timings)
+        return resp
+
+    async def close_notifications(_: Application) -> None:
+        await notifications.close()
+
+    if tracer is not None:
+        span_tracer = tracer
+        untraced_handler = handler
+
+        async def traced_handler(request: Request) -> Response:
+            parent = SpanContext.from_header(request.headers.get(TRACEPARENT))
+            async with span_tracer.span(
+                route, SpanKind.SERVER, parent
+            ) as span:
+                request[aiohttp_span_key()] = span
+                return await untraced_handler(request)
+
+        handler = traced_handler
 
     app = Application()
     app.add_routes([post(route, handler)])
+    app.on_cleanup.append(close_notifications)
+
+    if metrics is not None:
+
+        async def metrics_handler(_: Request) -> Response:
+            return Response(
+                text=metrics.render(), headers={"Content-Type": CONTENT_TYPE}
+            )
+
+        app.add_routes([get(metrics_route, metrics_handler)])
+
+    if profiler is not None:
+
+        async def profiler_handler(request: Request) -> Response:
+            stacks = profiler.collapsed()
+            if "reset" in request.query:
+                profiler.reset()
+            return Response(
+                text=stacks, headers={"Content-Type": PROFILE_CONTENT_TYPE}
+            )
+
+        async def close_profiler(_: Application) -> None:
+            profiler.close()
+
+        app.add_routes([get(profiler_route, profiler_handler)])
+        app.on_cleanup.append(close_profiler)
 
     return app
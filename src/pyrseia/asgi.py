@@ -0,0 +1,130 @@
+"""A plain ASGI server app, without a web framework."""
+from typing import Any, Awaitable, Callable, Dict, MutableMapping, Optional
+
+import attr
+from msgpack import dumps, loads
+
+from ._server import NotificationQueue, Server
+from .wire import Call, converter
+
+Scope = MutableMapping[str, Any]
+Message = MutableMapping[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+ASGIApp = Callable[[Scope, Receive, Send], Awaitable[None]]
+
+
+@attr.s(slots=True, frozen=True)
+class AsgiRequest:
+    """The request context of ASGI apps."""
+
+    scope: Scope = attr.ib()
+    _headers: Optional[Dict[str, str]] = attr.ib(
+        init=False, default=None, eq=False, repr=False
+    )
+
+    @property
+    def method(self) -> str:
+        return self.scope["method"]
+
+    @property
+    def path(self) -> str:
+        return self.scope["path"]
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        if self._headers is None:
+            # Decoded on first use, most handlers don't need them.
+            object.__setattr__(
+                self,
+                "_headers",
+                {
+                    k.decode("latin-1"): v.decode("latin-1")
+                    for k, v in self.scope["headers"]
+                },
+            )
+        return self._headers  # type: ignore
+
+
+async def _read_body(receive: Receive) -> Optional[bytes]:
+    """The request body, or None if the client disconnected."""
+    message = await receive()
+    if message["type"] == "http.disconnect":
+        return None
+    body = message.get("body", b"")
+    if not message.get("more_body", False):
+        return body
+    chunks = [body]
+    while message.get("more_body", False):
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        chunks.append(message.get("body", b""))
+    return b"".join(chunks)
+
+
+async def _respond(send: Send, status: int, body: bytes = b"") -> None:
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-length", str(len(body)).encode())],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+def create_asgi_app(
+    serv: Server[Any, AsgiRequest],
+    route: str = "/",
+    method: str = "POST",
+    notification_queue_size: int = 1024,
+    notification_workers: int = 4,
+) -> ASGIApp:
+    """Serve a single RPC route as a bare ASGI app.
+
+    Handlers get an `AsgiRequest` as their request context. Queued
+    notifications are waited for on lifespan shutdown.
+    """
+    notifications = NotificationQueue(
+        serv, notification_queue_size, notification_workers
+    )
+
+    async def lifespan(receive: Receive, send: Send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await notifications.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            if scope["type"] == "lifespan":
+                await lifespan(receive, send)
+            return
+        if scope["path"] != route:
+            await _respond(send, 404)
+            return
+        if scope["method"] != method:
+            await _respond(send, 405)
+            return
+
+        body = await _read_body(receive)
+        if body is None:
+            # Nobody's left to respond to.
+            return
+        call = converter.structure(loads(body), Call)
+        request = AsgiRequest(scope)
+
+        if serv.is_notification(call.name):
+            await notifications.put(call, request)
+            await _respond(send, 202)
+            return
+
+        resp = await serv.process(call, request)
+        await _respond(send, 200, dumps(converter.unstructure(resp)))
+
+    return app
@@ -0,0 +1,31 @@
+"""Calls over many items, with bounded concurrency."""
+from asyncio import FIRST_COMPLETED, Task, create_task, wait
+from typing import AsyncIterator, Awaitable, Callable, Iterable, Set, TypeVar
+
+A = TypeVar("A")
+R = TypeVar("R")
+
+
+async def bounded_map(
+    fn: Callable[[A], Awaitable[R]], items: Iterable[A], concurrency: int
+) -> AsyncIterator[R]:
+    """Run `fn` over items, at most `concurrency` at once.
+
+    Results are yielded as they finish, so not in order. Items are pulled
+    lazily, and calls still running are cancelled if iteration stops.
+    """
+    pending: Set["Task[R]"] = set()
+    try:
+        for item in items:
+            if len(pending) >= concurrency:
+                done, pending = await wait(pending, return_when=FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+            pending.add(create_task(fn(item)))  # type: ignore
+        while pending:
+            done, pending = await wait(pending, return_when=FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,207 @@
+"""Client-side circuit breaking."""
+from contextlib import asynccontextmanager
+from enum import Enum, unique
+from time import monotonic
+from typing import (
+    AsyncContextManager,
+    AsyncGenerator,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+)
+
+import attr
+
+from ._client import ClientAdapter
+from .wire import Call
+
+T = TypeVar("T")
+
+
+@attr.s(auto_exc=True, auto_attribs=True)
+class CircuitOpenError(Exception):
+    """The call was rejected locally since its circuit is open."""
+
+    endpoint: str
+    method: str
+
+
+@unique
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+@attr.s(slots=True, frozen=True)
+class BreakerPolicy:
+    """When to open a circuit, and how to close it again.
+
+    A closed circuit opens when, over the rolling `window` (in seconds),
+    at least `min_calls` calls were made and either the share of failed
+    calls reaches `failure_rate` or the share of calls slower than
+    `slow_call_duration` reaches `slow_call_rate`.
+
+    An open circuit rejects calls for `open_duration` seconds, and then
+    lets through up to `half_open_probes` probes. If all of them succeed
+    the circuit closes, otherwise it opens again.
+    """
+
+    failure_rate: float = attr.ib(default=0.5)
+    slow_call_rate: float = attr.ib(default=1.0)
+    slow_call_duration: float = attr.ib(default=5.0)
+    min_calls: int = attr.ib(default=20)
+    window: float = attr.ib(default=10.0)
+    buckets: int = attr.ib(default=10)
+    open_duration: float = attr.ib(default=5.0)
+    half_open_probes: int = attr.ib(default=3)
+    failure_on: Tuple[Type[BaseException], ...] = attr.ib(
+        default=(Exception,)
+    )
+
+
+@attr.s(slots=True)
+class Circuit:
+    """The state of a single (endpoint, method) circuit."""
+
+    policy: BreakerPolicy = attr.ib()
+    state: CircuitState = attr.ib(init=False, default=CircuitState.CLOSED)
+    _opened_at: float = attr.ib(init=False, default=0.0)
+    _probes: int = attr.ib(init=False, default=0)
+    _probe_successes: int = attr.ib(init=False, default=0)
+    # Each bucket is [bucket index, calls, failures, slow calls].
+    _buckets: List[List[int]] = attr.ib(init=False)
+
+    @_buckets.default
+    def _empty_buckets(self) -> List[List[int]]:
+        return [[-1, 0, 0, 0] for _ in range(self.policy.buckets)]
+
+    def acquire(self, now: float) -> Optional[CircuitState]:
+        """Ask for permission to make a call.
+
+        Returns the state the permit was granted in, or None if the call
+        should be rejected.
+        """
+        if self.state is CircuitState.OPEN:
+            if now - self._opened_at < self.policy.open_duration:
+                return None
+            self.state = CircuitState.HALF_OPEN
+            self._probes = 0
+            self._probe_successes = 0
+        if self.state is CircuitState.HALF_OPEN:
+            if self._probes >= self.policy.half_open_probes:
+                return None
+            self._probes += 1
+        return self.state
+
+    def release(self, permit: CircuitState) -> None:
+        """Give back a permit without recording an outcome."""
+        if permit is CircuitState.HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def record(
+        self, permit: CircuitState, now: float, duration: float, failed: bool
+    ) -> None:
+        slow = duration >= self.policy.slow_call_duration
+        if permit is CircuitState.HALF_OPEN:
+            if self.state is not CircuitState.HALF_OPEN:
+                return
+            if failed or slow:
+                self._open(now)
+            else:
+                self._probe_successes += 1
+                if self._probe_successes >= self.policy.half_open_probes:
+                    self.state = CircuitState.CLOSED
+                    self._buckets = self._empty_buckets()
+            return
+        if self.state is not CircuitState.CLOSED:
+            return
+
+        width = self.policy.window / self.policy.buckets
+        index = int(now / width)
+        bucket = self._buckets[index % self.policy.buckets]
+        if bucket[0] != index:
+            bucket[:] = [index, 0, 0, 0]
+        bucket[1] += 1
+        bucket[2] += failed
+        bucket[3] += slow
+
+        calls = failures = slow_calls = 0
+        for b in self._buckets:
+            if index - b[0] < self.policy.buckets:
+                calls += b[1]
+                failures += b[2]
+                slow_calls += b[3]
+        if calls < self.policy.min_calls:
+            return
+        if failures / calls >= self.policy.failure_rate:
+            self._open(now)
+        elif slow_calls / calls >= self.policy.slow_call_rate:
+            self._open(now)
+
+    def _open(self, now: float) -> None:
+        self.state = CircuitState.OPEN
+        self._opened_at = now
+
+
+@attr.s(slots=True)
+class CircuitBreaker:
+    """Circuits for an endpoint, one per method.
+
+    Share an instance between clients talking to the same endpoint.
+    """
+
+    endpoint: str = attr.ib(default="")
+    policy: BreakerPolicy = attr.ib(factory=BreakerPolicy)
+    policies: Mapping[str, BreakerPolicy] = attr.ib(factory=dict)
+    _circuits: Dict[str, Circuit] = attr.ib(init=False, factory=dict)
+
+    def circuit(self, method: str) -> Circuit:
+        res = self._circuits.get(method)
+        if res is None:
+            res = self._circuits[method] = Circuit(
+                self.policies.get(method, self.policy)
+            )
+        return res
+
+
+def circuit_breaker_client_adapter(
+    network_adapter: AsyncContextManager[ClientAdapter],
+    breaker: Optional[CircuitBreaker] = None,
+) -> AsyncContextManager[ClientAdapter]:
+    """Wrap a network adapter, failing fast while a circuit is open.
+
+    Rejected calls raise `CircuitOpenError`.
+    """
+    circuits = breaker if breaker is not None else CircuitBreaker()
+
+    @asynccontextmanager
+    async def adapter() -> AsyncGenerator[ClientAdapter, None]:
+        async with network_adapter as inner:
+
+            async def sender(call: Call, resp_type: Type[T]) -> T:
+                circuit = circuits.circuit(call.name)
+                start = monotonic()
+                permit = circuit.acquire(start)
+                if permit is None:
+                    raise CircuitOpenError(circuits.endpoint, call.name)
+                try:
+                    res = await inner(call, resp_type)
+                except circuit.policy.failure_on:
+                    now = monotonic()
+                    circuit.record(permit, now, now - start, True)
+                    raise
+                except BaseException:
+                    circuit.release(permit)
+                    raise
+                now = monotonic()
+                circuit.record(permit, now, now - start, False)
+                return res
+
+            yield sender
+
+    return adapter()
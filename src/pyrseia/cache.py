@@ -0,0 +1,160 @@
+"""Client-side response caching."""
+from asyncio import Task, create_task
+from collections import OrderedDict
+from time import monotonic
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    Optional,
+    TypeVar,
+)
+
+import attr
+from msgpack import dumps
+
+from .wire import converter
+
+F = TypeVar("F", bound=Callable[..., Any])
+T = TypeVar("T")
+
+
+@attr.s(slots=True, frozen=True)
+class CachePolicy:
+    """How long results of a method stay cached.
+
+    Results are fresh for `ttl` seconds. For `stale_while_revalidate`
+    seconds after that, they are still returned while a refresh runs in
+    the background.
+    """
+
+    ttl: float = attr.ib()
+    stale_while_revalidate: float = attr.ib(default=0.0)
+
+
+def cacheable(
+    ttl: float, stale_while_revalidate: float = 0.0
+) -> Callable[[F], F]:
+    """Mark an RPC method as cacheable by clients."""
+    policy = CachePolicy(ttl, stale_while_revalidate)
+
+    def wrapper(func: F) -> F:
+        func.__rpc_cache = policy  # type: ignore
+        return func
+
+    return wrapper
+
+
+def get_cache_policy(func: Callable) -> Optional[CachePolicy]:
+    return getattr(func, "__rpc_cache", None)
+
+
+def encoded_size(value: Any) -> int:
+    """The length of a result's msgpack encoding.
+
+    As a weigher, it bounds the cache by memory, but encodes every result
+    again when it's cached.
+    """
+    return len(dumps(converter.unstructure(value)))
+
+
+def _one(value: Any) -> int:
+    return 1
+
+
+@attr.s(slots=True)
+class _Entry:
+    value: Any = attr.ib()
+    expires_at: float = attr.ib()
+    size: int = attr.ib()
+
+
+@attr.s(slots=True)
+class ResponseCache:
+    """An in-memory LRU cache of structured results, bounded by weight.
+
+    Entries are weighed by `weigher`. By default they weigh 1 each, so
+    `max_weight` bounds the number of entries, not memory, and a single
+    result is cached whatever its size. To bound the cache by memory, pass
+    `weigher=encoded_size` and a `max_weight` in bytes. Cached results are
+    shared between callers, so they shouldn't be mutated.
+
+    Closing a client cancels the cache's background refreshes.
+    """
+
+    max_weight: int = attr.ib(default=10_000)
+    weigher: Callable[[Any], int] = attr.ib(default=_one)
+    clock: Callable[[], float] = attr.ib(default=monotonic)
+    size: int = attr.ib(init=False, default=0)
+    _entries: "OrderedDict[Hashable, _Entry]" = attr.ib(
+        init=False, factory=OrderedDict
+    )
+    _refreshes: Dict[Hashable, Task] = attr.ib(init=False, factory=dict)
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        policy: CachePolicy,
+        loader: Callable[[], Awaitable[T]],
+    ) -> T:
+        entry = self._entries.get(key)
+        if entry is not None:
+            now = self.clock()
+            if now < entry.expires_at + policy.stale_while_revalidate:
+                self._entries.move_to_end(key)
+                if now >= entry.expires_at and key not in self._refreshes:
+                    task = create_task(self._load(key, policy, loader))
+                    self._refreshes[key] = task
+                    task.add_done_callback(
+                        lambda t: self._refresh_done(key, t)
+                    )
+                return entry.value
+        return await self._load(key, policy, loader)
+
+    def put(self, key: Hashable, value: Any, policy: CachePolicy) -> None:
+        size = self.weigher(value)
+        self.invalidate(key)
+        if size > self.max_weight:
+            return
+        self._entries[key] = _Entry(value, self.clock() + policy.ttl, size)
+        self.size += size
+        while self.size > self.max_weight:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= evicted.size
+
+    def invalidate(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry.size
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+    def close(self) -> None:
+        """Cancel background refreshes."""
+        for task in self._refreshes.values():
+            task.cancel()
+        self._refreshes.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def _load(
+        self,
+        key: Hashable,
+        policy: CachePolicy,
+        loader: Callable[[], Awaitable[T]],
+    ) -> T:
+        value = await loader()
+        self.put(key, value, policy)
+        return value
+
+    def _refresh_done(self, key: Hashable, task: Task) -> None:
+        if self._refreshes.get(key) is task:
+            del self._refreshes[key]
+        if not task.cancelled():
+            # A failed refresh leaves the stale entry in place.
+            task.exception()
@@ -0,0 +1,261 @@
+"""Capturing server traffic, and replaying it."""
+from asyncio import (
+    Future,
+    Semaphore,
+    Task,
+    create_task,
+    gather,
+    get_running_loop,
+    sleep,
+)
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+from operator import attrgetter
+from os import path as os_path
+from os import replace
+from random import random
+from time import perf_counter, time
+from typing import (
+    Any,
+    Awaitable,
+    BinaryIO,
+    Callable,
+    DefaultDict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+import attr
+from msgpack import Packer, Unpacker
+
+from ._bench import LatencyHistogram
+from ._server import NextMiddleware
+from .wire import Call, converter
+
+logger = getLogger(__name__)
+
+
+@attr.s(slots=True, frozen=True)
+class Record:
+    """A captured call: when it arrived, how long it took, and its result."""
+
+    timestamp: float = attr.ib()
+    name: str = attr.ib()
+    args: Tuple[Any, ...] = attr.ib()
+    duration: float = attr.ib()
+    response: Any = attr.ib(default=None)
+
+
+@attr.s(slots=True)
+class TrafficRecorder:
+    """Records a sample of incoming calls into a msgpack log.
+
+    Records are buffered and written in batches of `flush_every` by a
+    background thread, as calls complete, so they aren't in timestamp
+    order. If more than `max_pending` records are waiting to be written,
+    new ones are dropped and counted in `dropped`. So are records lost to
+    failed writes, which are also logged.
+
+    Once the log reaches `max_bytes`, it's rotated like a logging
+    `RotatingFileHandler`, keeping `backup_count` older files.
+
+    Add `recorder.middleware` to a server's middleware, and close the
+    recorder on shutdown.
+    """
+
+    path: str = attr.ib()
+    sample_rate: float = attr.ib(default=1.0)
+    record_responses: bool = attr.ib(default=False)
+    max_bytes: int = attr.ib(default=64 * 1024 * 1024)
+    backup_count: int = attr.ib(default=5)
+    flush_every: int = attr.ib(default=256)
+    max_pending: int = attr.ib(default=65536)
+    dropped: int = attr.ib(init=False, default=0)
+    _buffer: List[list] = attr.ib(init=False, factory=list)
+    _writing: int = attr.ib(init=False, default=0)
+    _executor: ThreadPoolExecutor = attr.ib(
+        init=False, factory=lambda: ThreadPoolExecutor(1)
+    )
+    _file: Optional[BinaryIO] = attr.ib(init=False, default=None)
+
+    async def middleware(self, ctx: Any, call: Call, next: NextMiddleware):
+        if self.sample_rate < 1.0 and random() >= self.sample_rate:
+            return await next(ctx, call)
+        timestamp = time()
+        start = perf_counter()
+        try:
+            res = await next(ctx, call)
+        except Exception:
+            self._record(timestamp, call, perf_counter() - start, None)
+            raise
+        duration = perf_counter() - start
+        self._record(
+            timestamp,
+            call,
+            duration,
+            converter.unstructure(res) if self.record_responses else None,
+        )
+        return res
+
+    async def flush(self) -> None:
+        """Write out all buffered records."""
+        self._flush()
+        await get_running_loop().run_in_executor(self._executor, self._sync)
+
+    async def close(self) -> None:
+        await self.flush()
+        await get_running_loop().run_in_executor(
+            self._executor, self._close_file
+        )
+        # Its work is done, this just stops the writer thread. A fresh
+        # executor only starts a thread if the recorder is used again.
+        self._executor.shutdown(wait=True)
+        self._executor = ThreadPoolExecutor(1)
+
+    def _record(
+        self, timestamp: float, call: Call, duration: float, response: Any
+    ) -> None:
+        if len(self._buffer) + self._writing >= self.max_pending:
+            self.dropped += 1
+            return
+        self._buffer.append(
+            [timestamp, call.name, list(call.args), duration, response]
+        )
+        if len(self._buffer) >= self.flush_every:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._buffer:
+            return
+        batch = self._buffer
+        self._buffer = []
+        self._writing += len(batch)
+        fut = get_running_loop().run_in_executor(
+            self._executor, self._write, batch
+        )
+        fut.add_done_callback(lambda f: self._written(len(batch), f))
+
+    def _written(self, count: int, fut: "Future[None]") -> None:
+        self._writing -= count
+        if fut.cancelled():
+            self.dropped += count
+            return
+        exc = fut.exception()
+        if exc is not None:
+            self.dropped += count
+            logger.error(
+                "Failed to write %d captured records.", count, exc_info=exc
+            )
+
+    def _write(self, batch: List[list]) -> None:
+        packer = Packer()
+        data = b"".join(packer.pack(r) for r in batch)
+        f = self._file
+        if f is None:
+            f = self._file = open(self.path, "ab")
+        size = f.tell()
+        if size and size + len(data) > self.max_bytes:
+            f = self._rotate()
+        f.write(data)
+
+    def _sync(self) -> None:
+        if self._file is not None:
+            self._file.flush()
+
+    def _rotate(self) -> BinaryIO:
+        self._close_file()
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os_path.exists(src):
+                replace(src, f"{self.path}.{i + 1}")
+        if self.backup_count:
+            replace(self.path, f"{self.path}.1")
+        f = self._file = open(self.path, "wb")
+        return f
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def read_log(path: str) -> Iterator[Record]:
+    with open(path, "rb") as f:
+        for timestamp, name, args, duration, response in Unpacker(
+            f, raw=False
+        ):
+            yield Record(timestamp, name, tuple(args), duration, response)
+
+
+@attr.s(slots=True)
+class MethodComparison:
+    recorded: LatencyHistogram = attr.ib(factory=LatencyHistogram)
+    replayed: LatencyHistogram = attr.ib(factory=LatencyHistogram)
+    errors: int = attr.ib(default=0)
+
+
+async def replay(
+    records: Iterable[Record],
+    call: Callable[[str, Tuple[Any, ...]], Awaitable[Any]],
+    speed: Optional[float] = 1.0,
+    concurrency: int = 64,
+) -> DefaultDict[str, MethodComparison]:
+    """Replay records, comparing recorded and replayed latencies per method.
+
+    With a `speed`, calls are replayed in the order they arrived, with
+    their original spacing divided by the speed, with at most
+    `concurrency` in flight. Without one, they are replayed as fast as
+    `concurrency` callers can make them.
+    """
+    res: DefaultDict[str, MethodComparison] = defaultdict(MethodComparison)
+
+    async def one(record: Record) -> None:
+        comparison = res[record.name]
+        comparison.recorded.record(record.duration)
+        start = perf_counter()
+        try:
+            await call(record.name, record.args)
+        except Exception:
+            comparison.errors += 1
+        else:
+            comparison.replayed.record(perf_counter() - start)
+
+    if speed is None:
+        it = iter(records)
+
+        async def worker() -> None:
+            for record in it:
+                await one(record)
+
+        await gather(*(worker() for _ in range(concurrency)))
+        return res
+
+    slots = Semaphore(concurrency)
+    tasks: Set[Task] = set()
+
+    async def limited(record: Record) -> None:
+        try:
+            await one(record)
+        finally:
+            slots.release()
+
+    # Logs are in completion order, so a fast call can come before a slow
+    # one that arrived earlier.
+    ordered = sorted(records, key=attrgetter("timestamp"))
+    begin = perf_counter()
+    first = ordered[0].timestamp if ordered else 0.0
+    for record in ordered:
+        delay = begin + (record.timestamp - first) / speed - perf_counter()
+        if delay > 0:
+            await sleep(delay)
+        await slots.acquire()
+        task = create_task(limited(record))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    await gather(*tasks)
+    return res
@@ -0,0 +1,224 @@
+"""Negotiated compression of message bodies.
+
+Clients advertise their codecs in `Accept-Encoding`, and servers
+compress responses with the best codec the client accepts. Servers
+advertise their codecs in an `Accept-Encoding` response header (RFC
+7694), and clients only compress requests once a server has.
+
+Bodies are inflated a bounded chunk at a time, and ones that would grow
+past `Compression.max_decompressed_size` are rejected, so a small
+request can't exhaust a server's memory.
+
+Codecs other than the standard library's can be plugged in. Their
+`decompress(body, max_size)` must raise `BodyTooLargeError` rather than
+return more than `max_size` bytes.
+"""
+import gzip
+import zlib
+from asyncio import get_running_loop
+from functools import partial
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import attr
+
+ACCEPT_ENCODING = "Accept-Encoding"
+CONTENT_ENCODING = "Content-Encoding"
+VARY = "Vary"
+IDENTITY = "identity"
+
+
+@attr.s(slots=True, frozen=True)
+class Codec:
+    """An HTTP content coding."""
+
+    name: str = attr.ib()
+    compress: Callable[[bytes], bytes] = attr.ib()
+    decompress: Callable[[bytes, int], bytes] = attr.ib()
+
+
+@attr.s(auto_exc=True, auto_attribs=True)
+class UnsupportedEncodingError(Exception):
+    """A body used a content coding we don't have a codec for."""
+
+    encoding: str
+
+
+@attr.s(auto_exc=True, auto_attribs=True)
+class BodyTooLargeError(Exception):
+    """A body decompressed to more than `max_size` bytes."""
+
+    max_size: int
+
+
+def _zlib_decompress(wbits: int, body: bytes, max_size: int) -> bytes:
+    """Inflate a zlib, raw deflate or (multi-member) gzip body."""
+    decompressor: Any = zlib.decompressobj(wbits)
+    chunks: List[bytes] = []
+    size = 0
+    data = body
+    while True:
+        # Asking for one byte over the limit tells us it's been exceeded.
+        chunk = decompressor.decompress(data, max_size - size + 1)
+        size += len(chunk)
+        if size > max_size:
+            raise BodyTooLargeError(max_size)
+        chunks.append(chunk)
+        if decompressor.eof:
+            data = decompressor.unused_data
+            if not data:
+                return b"".join(chunks)
+            decompressor = zlib.decompressobj(wbits)
+        elif decompressor.unconsumed_tail:
+            data = decompressor.unconsumed_tail
+        elif chunk:
+            # The input is used up, but output may still be pending.
+            data = b""
+        else:
+            raise zlib.error("Incomplete or truncated stream")
+
+
+DEFLATE = Codec(
+    "deflate", zlib.compress, partial(_zlib_decompress, zlib.MAX_WBITS)
+)
+GZIP = Codec(
+    "gzip",
+    gzip.compress,
+    partial(_zlib_decompress, 16 + zlib.MAX_WBITS),
+)
+
+
+@attr.s(slots=True, frozen=True)
+class Compression:
+    """Compression of bodies of at least `min_size` bytes.
+
+    Codecs are in order of preference. Bodies of at least `offload_size`
+    bytes are (de)compressed in a thread, off the event loop. Bodies that
+    decompress to more than `max_decompressed_size` bytes raise
+    `BodyTooLargeError`, and servers answer them with a 413.
+    """
+
+    codecs: Sequence[Codec] = attr.ib(default=(DEFLATE, GZIP))
+    min_size: int = attr.ib(default=1024)
+    offload_size: int = attr.ib(default=256 * 1024)
+    max_decompressed_size: int = attr.ib(default=16 * 1024 * 1024)
+    _by_name: Mapping[str, Codec] = attr.ib(init=False, repr=False)
+    accept_encoding: str = attr.ib(init=False, repr=False)
+
+    @_by_name.default
+    def _index_codecs(self) -> Mapping[str, Codec]:
+        return {codec.name: codec for codec in self.codecs}
+
+    @accept_encoding.default
+    def _accept_encoding(self) -> str:
+        return ", ".join(codec.name for codec in self.codecs)
+
+    def negotiate(self, accept_encoding: Optional[str]) -> Optional[Codec]:
+        """Our most preferred codec out of the ones a peer accepts."""
+        if not accept_encoding:
+            return None
+        accepted = set()
+        refused = set()
+        for coding in accept_encoding.split(","):
+            name, *params = coding.split(";")
+            q = 1.0
+            for param in params:
+                key, _, value = param.strip().partition("=")
+                if key == "q":
+                    try:
+                        q = float(value)
+                    except ValueError:
+                        q = 0.0
+            if q > 0:
+                accepted.add(name.strip().lower())
+            else:
+                refused.add(name.strip().lower())
+        for codec in self.codecs:
+            if codec.name in refused:
+                continue
+            if codec.name in accepted or "*" in accepted:
+                return codec
+        return None
+
+    async def compress(
+        self, body: bytes, codec: Optional[Codec]
+    ) -> Tuple[bytes, Optional[str]]:
+        """Compress a large enough body, returning it and its coding."""
+        if codec is None or len(body) < self.min_size:
+            return body, None
+        return await self._run(codec.compress, body), codec.name
+
+    async def decompress(
+        self, body: bytes, content_encoding: Optional[str]
+    ) -> bytes:
+        if not content_encoding:
+            return body
+        name = content_encoding.strip().lower()
+        if name == IDENTITY:
+            return body
+        codec = self._by_name.get(name)
+        if codec is None:
+            raise UnsupportedEncodingError(content_encoding)
+        max_size = self.max_decompressed_size
+        return await self._run(
+            lambda body: codec.decompress(body, max_size),
+            body,
+        )
+
+    async def encode_response(
+        self, body: bytes, accept_encoding: Optional[str]
+    ) -> Tuple[bytes, Dict[str, str]]:
+        """Compress a response body, returning it and its headers."""
+        body, coding = await self.compress(
+            body, self.negotiate(accept_encoding)
+        )
+        headers = {
+            VARY: ACCEPT_ENCODING,
+            ACCEPT_ENCODING: self.accept_encoding,
+        }
+        if coding is not None:
+            headers[CONTENT_ENCODING] = coding
+        return body, headers
+
+    async def _run(self, fn: Callable[[bytes], bytes], body: bytes) -> bytes:
+        if len(body) < self.offload_size:
+            return fn(body)
+        return await get_running_loop().run_in_executor(None, fn, body)
+
+
+@attr.s(slots=True)
+class RequestEncoder:
+    """Compresses a client's requests with a codec its server accepts.
+
+    Until a response advertises the server's codecs, requests go out
+    uncompressed.
+    """
+
+    compression: Compression = attr.ib()
+    codec: Optional[Codec] = attr.ib(init=False, default=None)
+
+    async def encode(
+        self, body: bytes, headers: Optional[Dict[str, str]]
+    ) -> Tuple[bytes, Dict[str, str]]:
+        """Compress a request body, returning it and its headers."""
+        body, coding = await self.compression.compress(body, self.codec)
+        headers = dict(headers) if headers else {}
+        headers[ACCEPT_ENCODING] = self.compression.accept_encoding
+        if coding is not None:
+            headers[CONTENT_ENCODING] = coding
+        return body, headers
+
+    def update(self, status: int, accept_encoding: Optional[str]) -> None:
+        """Learn the server's codecs from a response."""
+        if accept_encoding is not None:
+            self.codec = self.compression.negotiate(accept_encoding)
+        elif status == 415:
+            self.codec = None
@@ -6,19 +6,28 @@ from typing import (
     Awaitable,
     Callable,
     Optional,
+    Tuple,
     Type,
     TypeVar,
 )
 
-from cattr import Converter
-from httpx import AsyncClient
+from httpx import AsyncClient, Response
 from msgpack import dumps, loads
 
-from pyrseia.wire import Call
+from pyrseia.wire import Call, converter
 
 from . import ClientAdapter
+from .compression import (
+    ACCEPT_ENCODING,
+    CONTENT_ENCODING,
+    IDENTITY,
+    Compression,
+    RequestEncoder,
+    UnsupportedEncodingError,
+)
+from .timing import StageTimings, TimingHook, stage_clock
+from .tracing import trace_headers
 
-converter = Converter()
 T = TypeVar("T")
 
 
@@ -28,15 +37,88 @@ def httpx_client_adapter(
     sender: Optional[
         Callable[[AsyncClient, Call, Type[T]], Awaitable[T]]
     ] = None,
+    timing_hook: Optional[TimingHook] = None,
+    compression: Optional[Compression] = None,
 ) -> AsyncContextManager[ClientAdapter]:
+    """An httpx client adapter.
+
+    With `compression`, compressed responses are accepted, and requests
+    are compressed once the server has advertised a codec. A call the
+    server refuses with a 415 for a codec it has dropped is sent again
+    once, encoded for the codecs it accepts now. It doesn't apply to
+    custom senders.
+    """
+    encoder = (
+        RequestEncoder(compression) if compression is not None else None
+    )
 
     if sender is None:
+        hook = timing_hook
+        clock = stage_clock(hook)
 
         async def s(client, call: Call, resp_type: Type[T]) -> T:
-            res = await client.post(
-                url, data=dumps(converter.unstructure(call))
-            )
-            return converter.structure(loads(res.content), resp_type)
+            t0 = clock()
+            raw = converter.unstructure(call)
+            t1 = clock()
+            plain = payload = dumps(raw)
+            trace = headers = trace_headers()
+            if encoder is not None:
+                payload, headers = await encoder.encode(payload, trace)
+            t2 = clock()
+            if compression is None:
+                # httpx reads the response body before returning it.
+                res = await client.post(url, data=payload, headers=headers)
+                content = res.content
+            else:
+                res, content = await _post_raw(client, url, payload, headers)
+            if encoder is not None:
+                encoder.update(
+                    res.status_code, res.headers.get(ACCEPT_ENCODING)
+                )
+                sent = res.request.headers
+                if res.status_code == 415 and CONTENT_ENCODING in sent:
+                    # The server has dropped our codec, so send the call
+                    # again, encoded for what it accepts now.
+                    payload, headers = await encoder.encode(plain, trace)
+                    res, content = await _post_raw(
+                        client, url, payload, headers
+                    )
+                if res.status_code == 415:
+                    raise UnsupportedEncodingError(
+                        res.request.headers.get(CONTENT_ENCODING, IDENTITY)
+                    )
+            t3 = clock()
+            if res.status_code == 202:
+                # A notification, there is no body.
+                if hook is not None:
+                    hook(
+                        StageTimings(
+                            call.name,
+                            unstructure=t1 - t0,
+                            dumps=t2 - t1,
+                            write=t3 - t2,
+                        )
+                    )
+                return None  # type: ignore
+            if compression is not None:
+                content = await compression.decompress(
+                    content, res.headers.get(CONTENT_ENCODING)
+                )
+            raw = loads(content)
+            t4 = clock()
+            result = converter.structure(raw, resp_type)
+            if hook is not None:
+                hook(
+                    StageTimings(
+                        call.name,
+                        loads=t4 - t3,
+                        structure=clock() - t4,
+                        unstructure=t1 - t0,
+                        dumps=t2 - t1,
+                        write=t3 - t2,
+                    )
+                )
+            return result
 
         sender = s
 
@@ -45,6 +127,17 @@ def httpx_client_adapter(
 
         async with AsyncClient(timeout=timeout) as client:
 
-            yield partial(s, client)
+            yield partial(sender, client)
 
     return adapter()
+
+
+async def _post_raw(
+    client: AsyncClient, url: str, payload: bytes, headers: Optional[dict]
+) -> Tuple[Response, bytes]:
+    """Post, reading the response body without decoding it."""
+    async with client.stream(
+        "POST", url, data=payload, headers=headers  # type: ignore
+    ) as res:
+        content = b"".join([chunk async for chunk in res.aiter_raw()])
+    return res, content
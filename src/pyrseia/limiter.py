@@ -0,0 +1,188 @@
+"""Adaptive client-side concurrency limiting."""
+from asyncio import CancelledError, Future, get_running_loop
+from collections import deque
+from contextlib import asynccontextmanager
+from math import sqrt
+from time import monotonic
+from typing import (
+    AsyncContextManager,
+    AsyncGenerator,
+    Deque,
+    Optional,
+    Protocol,
+    Tuple,
+    Type,
+    TypeVar,
+)
+
+import attr
+
+from ._client import ClientAdapter
+from .wire import Call
+
+T = TypeVar("T")
+
+
+@attr.s(auto_exc=True, auto_attribs=True)
+class LimitExceededError(Exception):
+    """The call was rejected locally since the limiter queue is full."""
+
+    limit: int
+    queued: int
+
+
+class LimitAlgorithm(Protocol):
+    limit: int
+
+    def update(self, rtt: float, in_flight: int, dropped: bool) -> None:
+        ...
+
+
+@attr.s(slots=True)
+class AIMDLimit:
+    """Additive increase, multiplicative decrease.
+
+    The limit grows by one while calls succeed and the limit is in use,
+    and is multiplied by `backoff_ratio` on errors or calls slower than
+    `timeout`.
+    """
+
+    limit: int = attr.ib(default=20)
+    min_limit: int = attr.ib(default=1)
+    max_limit: int = attr.ib(default=200)
+    backoff_ratio: float = attr.ib(default=0.9)
+    timeout: float = attr.ib(default=5.0)
+
+    def update(self, rtt: float, in_flight: int, dropped: bool) -> None:
+        if dropped or rtt > self.timeout:
+            self.limit = max(
+                self.min_limit, int(self.limit * self.backoff_ratio)
+            )
+        elif in_flight * 2 >= self.limit:
+            self.limit = min(self.max_limit, self.limit + 1)
+
+
+@attr.s(slots=True)
+class GradientLimit:
+    """Adjust the limit by the ratio of long-term to current latency.
+
+    When latency rises above its long-term average the limit shrinks
+    proportionally; while latency is stable the limit grows by a queue
+    allowance of the square root of the limit.
+    """
+
+    limit: int = attr.ib(default=20)
+    min_limit: int = attr.ib(default=1)
+    max_limit: int = attr.ib(default=200)
+    smoothing: float = attr.ib(default=0.2)
+    tolerance: float = attr.ib(default=1.5)
+    long_window: int = attr.ib(default=600)
+    backoff_ratio: float = attr.ib(default=0.9)
+    _estimate: float = attr.ib(init=False)
+    _long_rtt: float = attr.ib(init=False, default=0.0)
+
+    @_estimate.default
+    def _initial_estimate(self) -> float:
+        return float(self.limit)
+
+    def update(self, rtt: float, in_flight: int, dropped: bool) -> None:
+        if dropped:
+            new_limit = self._estimate * self.backoff_ratio
+        else:
+            if self._long_rtt == 0.0:
+                self._long_rtt = rtt
+            else:
+                self._long_rtt += (rtt - self._long_rtt) / self.long_window
+            # Don't grow the limit if it isn't being used.
+            if in_flight * 2 < self._estimate:
+                return
+            gradient = 1.0
+            if rtt > 0:
+                gradient = max(
+                    0.5, min(1.0, self.tolerance * self._long_rtt / rtt)
+                )
+            new_limit = self._estimate * gradient + sqrt(self._estimate)
+            new_limit = (
+                self._estimate + (new_limit - self._estimate) * self.smoothing
+            )
+        self._estimate = max(
+            float(self.min_limit), min(float(self.max_limit), new_limit)
+        )
+        self.limit = int(self._estimate)
+
+
+@attr.s(slots=True)
+class Limiter:
+    """Limits in-flight calls to the limit picked by an algorithm.
+
+    Calls over the limit wait in a queue of at most `max_queue` calls
+    (unbounded if None). Calls that don't fit in the queue raise
+    `LimitExceededError`.
+
+    Share an instance between clients talking to the same endpoint.
+    """
+
+    algorithm: LimitAlgorithm = attr.ib(factory=AIMDLimit)
+    max_queue: Optional[int] = attr.ib(default=None)
+    drop_on: Tuple[Type[BaseException], ...] = attr.ib(default=(Exception,))
+    in_flight: int = attr.ib(init=False, default=0)
+    _waiters: Deque[Future] = attr.ib(init=False, factory=deque)
+
+    async def acquire(self) -> None:
+        if self.in_flight < self.algorithm.limit and not self._waiters:
+            self.in_flight += 1
+            return
+        if self.max_queue is not None and len(self._waiters) >= self.max_queue:
+            raise LimitExceededError(self.algorithm.limit, len(self._waiters))
+        waiter = get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed to us, pass it on.
+                self.in_flight -= 1
+                self._wake()
+            else:
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self, rtt: float, dropped: bool) -> None:
+        self.algorithm.update(rtt, self.in_flight, dropped)
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < self.algorithm.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+
+def limiting_client_adapter(
+    network_adapter: AsyncContextManager[ClientAdapter],
+    limiter: Optional[Limiter] = None,
+) -> AsyncContextManager[ClientAdapter]:
+    """Wrap a network adapter, limiting concurrent calls adaptively."""
+    lim = limiter if limiter is not None else Limiter()
+
+    @asynccontextmanager
+    async def adapter() -> AsyncGenerator[ClientAdapter, None]:
+        async with network_adapter as inner:
+
+            async def sender(call: Call, resp_type: Type[T]) -> T:
+                await lim.acquire()
+                start = monotonic()
+                dropped = False
+                try:
+                    return await inner(call, resp_type)
+                except lim.drop_on:
+                    dropped = True
+                    raise
+                finally:
+                    lim.release(monotonic() - start, dropped)
+
+            yield sender
+
+    return adapter()
@@ -0,0 +1,110 @@
+"""Server metrics, in the Prometheus text format."""
+from bisect import bisect_left
+from time import perf_counter
+from typing import Any, Dict, List, Sequence
+
+import attr
+
+from ._server import NextMiddleware
+from .wire import Call
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+@attr.s(slots=True)
+class _MethodStats:
+    # The last bucket is +Inf.
+    buckets: List[int] = attr.ib()
+    calls: int = attr.ib(default=0)
+    errors: int = attr.ib(default=0)
+    in_flight: int = attr.ib(default=0)
+    duration: float = attr.ib(default=0.0)
+
+
+@attr.s(slots=True)
+class Metrics:
+    """Per-method call counts, errors, in-flight calls and latencies.
+
+    Add `metrics.middleware` to a server's middleware, and pass the
+    metrics to an app factory to expose them.
+    """
+
+    buckets: Sequence[float] = attr.ib(default=DEFAULT_BUCKETS)
+    prefix: str = attr.ib(default="pyrseia")
+    _methods: Dict[str, _MethodStats] = attr.ib(init=False, factory=dict)
+
+    async def middleware(self, ctx: Any, call: Call, next: NextMiddleware):
+        stats = self._methods.get(call.name)
+        if stats is None:
+            stats = self._methods[call.name] = _MethodStats(
+                [0] * (len(self.buckets) + 1)
+            )
+        stats.in_flight += 1
+        start = perf_counter()
+        try:
+            return await next(ctx, call)
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            duration = perf_counter() - start
+            stats.in_flight -= 1
+            stats.calls += 1
+            stats.duration += duration
+            stats.buckets[bisect_left(self.buckets, duration)] += 1
+
+    def render(self) -> str:
+        """Render the metrics in the Prometheus text format."""
+        p = self.prefix
+        methods = sorted(self._methods.items())
+        lines = [
+            f"# HELP {p}_calls_total Calls processed.",
+            f"# TYPE {p}_calls_total counter",
+        ]
+        lines.extend(
+            f'{p}_calls_total{{method="{m}"}} {s.calls}' for m, s in methods
+        )
+        lines.append(f"# HELP {p}_errors_total Calls that raised.")
+        lines.append(f"# TYPE {p}_errors_total counter")
+        lines.extend(
+            f'{p}_errors_total{{method="{m}"}} {s.errors}' for m, s in methods
+        )
+        lines.append(f"# HELP {p}_in_flight Calls being processed.")
+        lines.append(f"# TYPE {p}_in_flight gauge")
+        lines.extend(
+            f'{p}_in_flight{{method="{m}"}} {s.in_flight}' for m, s in methods
+        )
+        lines.append(f"# HELP {p}_call_duration_seconds Call latency.")
+        lines.append(f"# TYPE {p}_call_duration_seconds histogram")
+        bounds = [repr(float(b)) for b in self.buckets] + ["+Inf"]
+        for m, s in methods:
+            cumulative = 0
+            for bound, count in zip(bounds, s.buckets):
+                cumulative += count
+                lines.append(
+                    f'{p}_call_duration_seconds_bucket{{method="{m}",'
+                    f'le="{bound}"}} {cumulative}'
+                )
+            lines.append(
+                f'{p}_call_duration_seconds_sum{{method="{m}"}} {s.duration}'
+            )
+            lines.append(
+                f'{p}_call_duration_seconds_count{{method="{m}"}} {s.calls}'
+            )
+        lines.append("")
+        return "\n".join(lines)
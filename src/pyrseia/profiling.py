@@ -0,0 +1,135 @@
+"""On-demand sampling profiling of server calls."""
+from collections import Counter
+from random import random
+from sys import _current_frames, _getframe
+from threading import Event, Lock, Thread, get_ident
+from time import sleep
+from types import FrameType
+from typing import Any, Dict, List, Mapping, Optional
+
+import attr
+
+from ._server import NextMiddleware
+from .wire import Call
+
+CONTENT_TYPE = "text/plain; charset=utf-8"
+
+
+def _label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})"
+
+
+@attr.s(slots=True)
+class SamplingProfiler:
+    """Samples the stacks of profiled calls, aggregated by method.
+
+    A call is profiled with a probability of its method's rate in `rates`,
+    or `sample_rate` if its method isn't present. Given a `debug_header`,
+    calls whose request context has that header are always profiled. Only
+    set it on servers where every caller is trusted. The same goes for
+    exposing stacks, which include source paths.
+
+    While profiled calls are running, a background thread samples the
+    event loop thread every `interval` seconds. Only time spent running
+    on the event loop is captured; time spent waiting on I/O isn't.
+
+    Add `profiler.middleware` to a server's middleware, and pass the
+    profiler to an app factory to expose the stacks.
+    """
+
+    sample_rate: float = attr.ib(default=0.0)
+    rates: Mapping[str, float] = attr.ib(factory=dict)
+    debug_header: Optional[str] = attr.ib(default=None)
+    interval: float = attr.ib(default=0.005)
+    # ASGI header names are lowercase.
+    _debug_header_lower: Optional[str] = attr.ib(init=False)
+    _stacks: "Counter[str]" = attr.ib(init=False, factory=Counter)
+    # Frames of profiled middleware calls, mapped to their method names.
+    _active: Dict[FrameType, str] = attr.ib(init=False, factory=dict)
+    _loop_thread: int = attr.ib(init=False, default=0)
+    _wakeup: Event = attr.ib(init=False, factory=Event)
+    _lock: Lock = attr.ib(init=False, factory=Lock)
+    _thread: Optional[Thread] = attr.ib(init=False, default=None)
+    _stopping: bool = attr.ib(init=False, default=False)
+
+    @_debug_header_lower.default
+    def _lower_debug_header(self) -> Optional[str]:
+        if self.debug_header is None:
+            return None
+        return self.debug_header.lower()
+
+    async def middleware(self, ctx: Any, call: Call, next: NextMiddleware):
+        if not self._should_profile(ctx, call):
+            return await next(ctx, call)
+        frame = _getframe()
+        self._loop_thread = get_ident()
+        self._active[frame] = call.name
+        if self._thread is None:
+            self._thread = Thread(
+                target=self._sample, name="pyrseia-profiler", daemon=True
+            )
+            self._thread.start()
+        self._wakeup.set()
+        try:
+            return await next(ctx, call)
+        finally:
+            del self._active[frame]
+            if not self._active:
+                self._wakeup.clear()
+
+    def collapsed(self) -> str:
+        """The sampled stacks, in the collapsed flamegraph format."""
+        with self._lock:
+            items = sorted(self._stacks.items())
+        return "".join(f"{stack} {count}\n" for stack, count in items)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stacks.clear()
+
+    def close(self) -> None:
+        """Stop the sampling thread, and wait for it to exit.
+
+        The thread is started again by the next profiled call.
+        """
+        thread = self._thread
+        if thread is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        thread.join()
+        self._thread = None
+        self._stopping = False
+        if not self._active:
+            self._wakeup.clear()
+
+    def _should_profile(self, ctx: Any, call: Call) -> bool:
+        if self.debug_header is not None:
+            headers = getattr(ctx, "headers", None)
+            if headers is not None:
+                if self._debug_header_lower in headers:
+                    return True
+                if self.debug_header in headers:
+                    return True
+        rate = self.rates.get(call.name, self.sample_rate)
+        return rate > 0 and random() < rate
+
+    def _sample(self) -> None:
+        while True:
+            self._wakeup.wait()
+            if self._stopping:
+                return
+            frame = _current_frames().get(self._loop_thread)
+            active = self._active.copy()
+            stack: List[str] = []
+            while frame is not None:
+                method = active.get(frame)
+                if method is not None:
+                    stack.append(method)
+                    with self._lock:
+                        self._stacks[";".join(reversed(stack))] += 1
+                    break
+                stack.append(_label(frame))
+                frame = frame.f_back
+            sleep(self.interval)
@@ -0,0 +1,136 @@
+"""Retrying client adapters."""
+from asyncio import TimeoutError as AsyncioTimeoutError
+from asyncio import sleep
+from contextlib import asynccontextmanager
+from random import uniform
+from time import monotonic
+from typing import (
+    AsyncContextManager,
+    AsyncGenerator,
+    Mapping,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+)
+
+import attr
+
+from ._client import ClientAdapter
+from .wire import Call
+
+T = TypeVar("T")
+
+# Connection errors and timeouts. aiohttp's connection errors don't all
+# subclass OSError.
+TRANSIENT_ERRORS: Tuple[Type[BaseException], ...] = (
+    OSError,
+    AsyncioTimeoutError,
+)
+try:
+    from aiohttp import ClientConnectionError
+except ImportError:
+    pass
+else:
+    TRANSIENT_ERRORS += (ClientConnectionError,)
+
+
+@attr.s(slots=True)
+class RetryBudget:
+    """A token bucket capping retries at a share of regular traffic.
+
+    Every call deposits `ratio` tokens and every retry withdraws one.
+    A reserve of `min_per_second` retries is always available, so clients
+    with little traffic can still retry.
+
+    A single budget can be shared between any number of adapters.
+    """
+
+    ratio: float = attr.ib(default=0.1)
+    min_per_second: float = attr.ib(default=10.0)
+    max_tokens: float = attr.ib(default=100.0)
+    _balance: float = attr.ib(init=False, default=0.0)
+    _reserve: float = attr.ib(
+        init=False,
+        default=attr.Factory(lambda s: s.min_per_second, takes_self=True),
+    )
+    _last_refill: float = attr.ib(init=False, factory=monotonic)
+
+    def deposit(self) -> None:
+        self._balance = min(self.max_tokens, self._balance + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        now = monotonic()
+        self._reserve = min(
+            self.min_per_second,
+            self._reserve + (now - self._last_refill) * self.min_per_second,
+        )
+        self._last_refill = now
+        if self._reserve >= 1:
+            self._reserve -= 1
+            return True
+        if self._balance >= 1:
+            self._balance -= 1
+            return True
+        return False
+
+
+@attr.s(slots=True, frozen=True)
+class RetryPolicy:
+    """How to retry a method.
+
+    Only exceptions in `retry_on` are retried, by default
+    `TRANSIENT_ERRORS`. Transports raising other errors for dropped
+    connections need them added. Delays between attempts use exponential
+    backoff with full jitter.
+    """
+
+    max_attempts: int = attr.ib(default=3)
+    retry_on: Tuple[Type[BaseException], ...] = attr.ib(
+        default=TRANSIENT_ERRORS
+    )
+    base_delay: float = attr.ib(default=0.05)
+    max_delay: float = attr.ib(default=2.0)
+
+    def backoff(self, attempt: int) -> float:
+        return uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+def retrying_client_adapter(
+    network_adapter: AsyncContextManager[ClientAdapter],
+    policies: Mapping[str, RetryPolicy] = {},
+    default: Optional[RetryPolicy] = None,
+    budget: Optional[RetryBudget] = None,
+) -> AsyncContextManager[ClientAdapter]:
+    """Wrap a network adapter, retrying failed calls.
+
+    Policies are looked up by method name, falling back to `default`.
+    Methods without a policy are never retried, so only idempotent methods
+    should be given one.
+    """
+    retry_budget = budget if budget is not None else RetryBudget()
+
+    @asynccontextmanager
+    async def adapter() -> AsyncGenerator[ClientAdapter, None]:
+        async with network_adapter as inner:
+
+            async def sender(call: Call, resp_type: Type[T]) -> T:
+                retry_budget.deposit()
+                policy = policies.get(call.name, default)
+                if policy is None:
+                    return await inner(call, resp_type)
+                attempt = 1
+                while True:
+                    try:
+                        return await inner(call, resp_type)
+                    except policy.retry_on:
+                        if attempt >= policy.max_attempts:
+                            raise
+                        if not retry_budget.try_withdraw():
+                            raise
+                    await sleep(policy.backoff(attempt))
+                    attempt += 1
+
+            yield sender
+
+    return adapter()
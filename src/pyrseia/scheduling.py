@@ -0,0 +1,116 @@
+"""Weighted fair admission of server calls across priority classes."""
+from asyncio import CancelledError, Future, get_running_loop
+from collections import deque
+from typing import (
+    Callable,
+    Deque,
+    Dict,
+    Generic,
+    Mapping,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+import attr
+
+from .wire import Call
+
+CTXT = TypeVar("CTXT")
+
+# A queued call's virtual finish time and its waiter.
+_Entry = Tuple[float, Future]
+
+
+@attr.s(auto_exc=True, auto_attribs=True)
+class OverloadedError(Exception):
+    """The call was rejected since the scheduler queue is full."""
+
+    limit: int
+    queued: int
+
+
+@attr.s(slots=True)
+class FairScheduler(Generic[CTXT]):
+    """Admits calls over a concurrency limit by weighted fair queuing.
+
+    Up to `limit` calls run at once. Calls over it wait in a queue per
+    priority class, and backlogged classes are admitted in proportion to
+    their weights; classes missing from `weights` weigh 1. Calls that
+    don't fit in a queue of `max_queue` calls (unbounded if None) raise
+    `OverloadedError`.
+
+    A call's class is picked by `classify`, if given and it doesn't return
+    None, then by the method's `priority`, then `default_class`.
+    """
+
+    limit: int = attr.ib(default=64)
+    weights: Mapping[str, float] = attr.ib(factory=dict)
+    default_class: str = attr.ib(default="default")
+    max_queue: Optional[int] = attr.ib(default=None)
+    classify: Optional[Callable[[CTXT, Call], Optional[str]]] = attr.ib(
+        default=None
+    )
+    in_flight: int = attr.ib(init=False, default=0)
+    queued: int = attr.ib(init=False, default=0)
+    _queues: Dict[str, Deque[_Entry]] = attr.ib(init=False, factory=dict)
+    _virtual_time: float = attr.ib(init=False, default=0.0)
+
+    def try_acquire(self) -> bool:
+        """Take a slot if one is free and nobody is waiting for it."""
+        if self.in_flight < self.limit and not self.queued:
+            self.in_flight += 1
+            return True
+        return False
+
+    async def acquire(self, cls: str) -> None:
+        if self.try_acquire():
+            return
+        if self.max_queue is not None and self.queued >= self.max_queue:
+            raise OverloadedError(self.limit, self.queued)
+        queue = self._queues.get(cls)
+        if queue is None:
+            queue = self._queues[cls] = deque()
+        # A class starts where it left off, or now if it was idle, so
+        # idling doesn't bank credit.
+        start = queue[-1][0] if queue else self._virtual_time
+        waiter = get_running_loop().create_future()
+        entry = (start + 1.0 / self.weights.get(cls, 1.0), waiter)
+        queue.append(entry)
+        self.queued += 1
+        try:
+            await waiter
+        except CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed to us, pass it on.
+                self.in_flight -= 1
+                self._wake()
+            else:
+                self._forget(cls, entry)
+            raise
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+
+    def _forget(self, cls: str, entry: _Entry) -> None:
+        queue = self._queues.get(cls)
+        if queue is not None and entry in queue:
+            queue.remove(entry)
+            self.queued -= 1
+            if not queue:
+                del self._queues[cls]
+
+    def _wake(self) -> None:
+        while self.queued and self.in_flight < self.limit:
+            # The head with the earliest finish time goes first.
+            cls, queue = min(self._queues.items(), key=lambda i: i[1][0][0])
+            finish, waiter = queue.popleft()
+            self.queued -= 1
+            if not queue:
+                del self._queues[cls]
+            if waiter.done():
+                continue
+            self._virtual_time = finish
+            self.in_flight += 1
+            waiter.set_result(None)
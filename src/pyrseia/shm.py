@@ -0,0 +1,390 @@
+"""A shared-memory transport, for clients and servers on the same host.
+
+Each client connection creates a shared memory block split into two
+rings: requests are written into the first, and responses into the
+second. Only small frames pointing into the rings go over a Unix socket.
+Payloads that don't fit into their ring are sent inline on the socket.
+"""
+from asyncio import (
+    AbstractServer,
+    CancelledError,
+    Future,
+    IncompleteReadError,
+    StreamReader,
+    StreamWriter,
+    Task,
+    create_task,
+    current_task,
+    gather,
+    get_running_loop,
+    open_unix_connection,
+    start_unix_server,
+)
+from collections import deque
+from contextlib import asynccontextmanager
+from enum import IntEnum, unique
+from logging import getLogger
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from struct import Struct
+from sys import version_info
+from typing import (
+    Any,
+    AsyncContextManager,
+    AsyncGenerator,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    TypeVar,
+)
+
+import attr
+from msgpack import dumps, loads
+
+from ._client import ClientAdapter
+from ._server import NotificationQueue, Server
+from .wire import Call, converter
+
+T = TypeVar("T")
+
+logger = getLogger(__name__)
+
+# Frames are a kind, a call ID, and an offset and length into a ring.
+# Inline payloads follow their frame.
+_FRAME = Struct("!BIII")
+_HANDSHAKE = Struct("!HI")
+
+# Shared memory created by this process, so attaching doesn't untrack it.
+_created: Set[str] = set()
+
+
+@unique
+class _Kind(IntEnum):
+    REQUEST = 0
+    REQUEST_INLINE = 1
+    RESPONSE = 2
+    RESPONSE_INLINE = 3
+    ACCEPTED = 4
+    ERROR = 5
+    RELEASE = 6
+
+
+@attr.s(auto_exc=True, auto_attribs=True)
+class RemoteError(Exception):
+    """The server failed to process a call."""
+
+    message: str
+
+
+@attr.s(slots=True)
+class _Ring:
+    """Allocates regions of a buffer in a ring.
+
+    Regions can be freed in any order, but space is only reclaimed up to
+    the oldest region still in use.
+    """
+
+    size: int = attr.ib()
+    _head: int = attr.ib(init=False, default=0)
+    # Live regions, oldest first: [start, end, freed].
+    _live: Deque[List[Any]] = attr.ib(init=False, factory=deque)
+    _by_start: Dict[int, List[Any]] = attr.ib(init=False, factory=dict)
+
+    def alloc(self, length: int) -> Optional[int]:
+        if not self._live:
+            start = 0 if length <= self.size else None
+        else:
+            tail = self._live[0][0]
+            if self._head > tail:
+                if length <= self.size - self._head:
+                    start = self._head
+                elif length <= tail:
+                    start = 0
+                else:
+                    start = None
+            elif length <= tail - self._head:
+                start = self._head
+            else:
+                start = None
+        if start is None:
+            return None
+        region = [start, start + length, False]
+        self._live.append(region)
+        self._by_start[start] = region
+        self._head = start + length
+        return start
+
+    def free(self, start: int) -> None:
+        self._by_start.pop(start)[2] = True
+        while self._live and self._live[0][2]:
+            self._live.popleft()
+        if not self._live:
+            self._head = 0
+
+
+def _attach(name: str) -> SharedMemory:
+    # Otherwise our resource tracker unlinks it when we exit.
+    if version_info >= (3, 13):
+        return SharedMemory(name, track=False)  # type: ignore
+    shm = SharedMemory(name)
+    if name not in _created:
+        resource_tracker.unregister(
+            shm._name, "shared_memory"  # type: ignore
+        )
+    return shm
+
+
+async def _read_frame(
+    reader: StreamReader,
+) -> Tuple[_Kind, int, int, int, Optional[bytes]]:
+    kind, call_id, offset, length = _FRAME.unpack(
+        await reader.readexactly(_FRAME.size)
+    )
+    kind = _Kind(kind)
+    inline = None
+    if kind in (_Kind.REQUEST_INLINE, _Kind.RESPONSE_INLINE, _Kind.ERROR):
+        inline = await reader.readexactly(length)
+    return kind, call_id, offset, length, inline
+
+
+def shm_client_adapter(
+    path: str, ring_size: int = 16 * 1024 * 1024
+) -> AsyncContextManager[ClientAdapter]:
+    """Connect to a `serve_shm` server listening on a Unix socket."""
+
+    @asynccontextmanager
+    async def adapter() -> AsyncGenerator[ClientAdapter, None]:
+        reader, writer = await open_unix_connection(path)
+        shm = SharedMemory(create=True, size=2 * ring_size)
+        _created.add(shm.name)
+        buf: memoryview = shm.buf  # type: ignore
+        requests = _Ring(ring_size)
+        # Futures of calls in flight, and their request regions.
+        pending: Dict[int, Tuple[Future, Optional[int]]] = {}
+        next_id = 0
+        # Why the connection failed, once it has.
+        failure: Optional[ConnectionError] = None
+
+        async def read_responses() -> None:
+            nonlocal failure
+            # The server's reason for refusing the connection, if any.
+            refused: Optional[str] = None
+            try:
+                while True:
+                    frame = await _read_frame(reader)
+                    if frame[1] not in pending:
+                        if frame[0] is _Kind.ERROR:
+                            refused = frame[4].decode()  # type: ignore
+                        continue
+                    fut, start = pending.pop(frame[1])
+                    if start is not None:
+                        # The server is done with the request by now.
+                        requests.free(start)
+                    if not fut.done():
+                        fut.set_result(frame)
+                    elif frame[0] is _Kind.RESPONSE:
+                        # The caller went away.
+                        writer.write(
+                            _FRAME.pack(_Kind.RELEASE, frame[1], 0, 0)
+                        )
+            except (IncompleteReadError, ConnectionError) as exc:
+                failure = ConnectionError(refused or exc)
+                for fut, _ in pending.values():
+                    if not fut.done():
+                        fut.set_exception(failure)
+                pending.clear()
+
+        async def sender(call: Call, resp_type: Type[T]) -> T:
+            nonlocal next_id
+            if failure is not None:
+                raise failure
+            if writer.is_closing():
+                raise ConnectionError("The connection is closed.")
+            # Call IDs start at 1, 0 is for the connection itself.
+            call_id = next_id = next_id % 0xFFFFFFFF + 1
+            payload = dumps(converter.unstructure(call))
+            start = requests.alloc(len(payload))
+            fut = get_running_loop().create_future()
+            pending[call_id] = (fut, start)
+            if start is None:
+                writer.write(
+                    _FRAME.pack(_Kind.REQUEST_INLINE, call_id, 0, len(payload))
+                )
+                writer.write(payload)
+                await writer.drain()
+            else:
+                buf[start:start + len(payload)] = payload
+                writer.write(
+                    _FRAME.pack(_Kind.REQUEST, call_id, start, len(payload))
+                )
+                await writer.drain()
+            kind, _, offset, length, inline = await fut
+
+            if kind is _Kind.ACCEPTED:
+                # A notification, there is no response.
+                return None  # type: ignore
+            if kind is _Kind.ERROR:
+                raise RemoteError(inline.decode())  # type: ignore
+            if kind is _Kind.RESPONSE_INLINE:
+                return converter.structure(loads(inline), resp_type)
+            offset += ring_size
+            try:
+                raw = loads(buf[offset:offset + length])
+            finally:
+                writer.write(_FRAME.pack(_Kind.RELEASE, call_id, 0, 0))
+            return converter.structure(raw, resp_type)
+
+        writer.write(_HANDSHAKE.pack(len(shm.name), ring_size))
+        writer.write(shm.name.encode())
+        reader_task = create_task(read_responses())
+        try:
+            yield sender
+        finally:
+            reader_task.cancel()
+            writer.close()
+            try:
+                await reader_task
+            except CancelledError:
+                pass
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+            shm.close()
+            shm.unlink()
+            _created.discard(shm.name)
+
+    return adapter()
+
+
+@asynccontextmanager
+async def serve_shm(
+    serv: Server[Any, None],
+    path: str,
+    notification_queue_size: int = 1024,
+    notification_workers: int = 4,
+) -> AsyncGenerator[AbstractServer, None]:
+    """Serve clients of `shm_client_adapter` on a Unix socket.
+
+    Handlers get no request context.
+    """
+    notifications = NotificationQueue(
+        serv, notification_queue_size, notification_workers
+    )
+    # Connection handlers and their writers, closed along with the server.
+    handlers: Dict[Task, StreamWriter] = {}
+
+    async def handle(reader: StreamReader, writer: StreamWriter) -> None:
+        handler = current_task()
+        assert handler is not None
+        handlers[handler] = writer
+        try:
+            await serve_connection(reader, writer)
+        finally:
+            del handlers[handler]
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def serve_connection(
+        reader: StreamReader, writer: StreamWriter
+    ) -> None:
+        try:
+            name_length, ring_size = _HANDSHAKE.unpack(
+                await reader.readexactly(_HANDSHAKE.size)
+            )
+            name = (await reader.readexactly(name_length)).decode()
+        except IncompleteReadError:
+            return
+        try:
+            shm = _attach(name)
+        except FileNotFoundError:
+            logger.warning("Shared memory %s not found.", name)
+            message = f"Shared memory {name} not found.".encode()
+            writer.write(_FRAME.pack(_Kind.ERROR, 0, 0, len(message)))
+            writer.write(message)
+            await writer.drain()
+            return
+        buf: memoryview = shm.buf  # type: ignore
+        responses = _Ring(ring_size)
+        # Response regions by call ID, until the client releases them.
+        sent: Dict[int, int] = {}
+        tasks: Set[Task] = set()
+
+        async def respond(call_id: int, call: Call) -> None:
+            try:
+                res = await serv.process(call, None)
+            except Exception as exc:
+                logger.exception("Call %s failed.", call.name)
+                message = repr(exc).encode()
+                writer.write(
+                    _FRAME.pack(_Kind.ERROR, call_id, 0, len(message))
+                )
+                writer.write(message)
+                await writer.drain()
+                return
+            payload = dumps(converter.unstructure(res))
+            start = responses.alloc(len(payload))
+            if start is None:
+                writer.write(
+                    _FRAME.pack(
+                        _Kind.RESPONSE_INLINE, call_id, 0, len(payload)
+                    )
+                )
+                writer.write(payload)
+            else:
+                offset = ring_size + start
+                buf[offset:offset + len(payload)] = payload
+                sent[call_id] = start
+                writer.write(
+                    _FRAME.pack(_Kind.RESPONSE, call_id, start, len(payload))
+                )
+            await writer.drain()
+
+        try:
+            while True:
+                kind, call_id, offset, length, inline = await _read_frame(
+                    reader
+                )
+                if kind is _Kind.RELEASE:
+                    responses.free(sent.pop(call_id))
+                    continue
+                if kind is _Kind.REQUEST:
+                    raw = loads(buf[offset:offset + length])
+                else:
+                    raw = loads(inline)  # type: ignore
+                call = converter.structure(raw, Call)
+                if serv.is_notification(call.name):
+                    await notifications.put(call, None)
+                    writer.write(_FRAME.pack(_Kind.ACCEPTED, call_id, 0, 0))
+                    continue
+                task = create_task(respond(call_id, call))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            await gather(*tasks, return_exceptions=True)
+            shm.close()
+
+    server = await start_unix_server(handle, path)
+    try:
+        yield server
+    finally:
+        server.close()
+        # Closing the server doesn't close its connections. Closing their
+        # writers ends them on EOF; cancelling the handlers instead would
+        # make asyncio log them as failed.
+        for writer in handlers.values():
+            writer.close()
+        await gather(*handlers, return_exceptions=True)
+        await server.wait_closed()
+        await notifications.close()
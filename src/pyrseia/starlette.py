@@ -1,34 +1,173 @@
-from typing import Any, TypeVar
+from contextlib import asynccontextmanager
+from time import perf_counter
+from typing import Any, AsyncGenerator, Awaitable, Callable, Optional, TypeVar
 
-from cattr import Converter
 from msgpack import dumps, loads
 from starlette.applications import Starlette
 from starlette.requests import Request
 from starlette.responses import Response
 from starlette.routing import Route
 
-from ._server import Server
-from .wire import Call
+from ._server import NotificationQueue, Server
+from .compression import (
+    ACCEPT_ENCODING,
+    CONTENT_ENCODING,
+    BodyTooLargeError,
+    Compression,
+    UnsupportedEncodingError,
+)
+from .metrics import CONTENT_TYPE, Metrics
+from .profiling import CONTENT_TYPE as PROFILE_CONTENT_TYPE
+from .profiling import SamplingProfiler
+from .timing import StageTimings, TimingHook, stage_clock
+from .tracing import (
+    SPAN_KEY,
+    TRACEPARENT,
+    SpanContext,
+    SpanKind,
+    Tracer,
+    traced_process,
+)
+from .wire import Call, converter
 
 T = TypeVar("T")
-converter = Converter()
 
 
 def create_starlette_app(
-    serv: Server[Any, Request], route: str = "/", debug=False, method="POST"
+    serv: Server[Any, Request],
+    route: str = "/",
+    debug=False,
+    method="POST",
+    notification_queue_size: int = 1024,
+    notification_workers: int = 4,
+    metrics: Optional[Metrics] = None,
+    metrics_route: str = "/metrics",
+    timing_hook: Optional[TimingHook] = None,
+    profiler: Optional[SamplingProfiler] = None,
+    profiler_route: str = "/debug/profile",
+    tracer: Optional[Tracer] = None,
+    compression: Optional[Compression] = None,
 ) -> Starlette:
-    def input_adapter(payload: bytes) -> Call:
-        return converter.structure(loads(payload), Call)
+    notifications = NotificationQueue(
+        serv, notification_queue_size, notification_workers, tracer
+    )
+    process: Callable[..., Awaitable[Any]] = serv.process
+    if tracer is not None:
+        process = traced_process(tracer, serv.process)
+
+    hook = timing_hook
+    clock = stage_clock(hook)
 
     async def handler(request: Request):
+        t0 = clock()
         payload = await request.body()
+        if compression is not None:
+            try:
+                payload = await compression.decompress(
+                    payload, request.headers.get(CONTENT_ENCODING)
+                )
+            except UnsupportedEncodingError:
+                return Response(
+                    status_code=415,
+                    headers={ACCEPT_ENCODING: compression.accept_encoding},
+                )
+            except BodyTooLargeError:
+                return Response(status_code=413)
+        t1 = clock()
+        raw = loads(payload)
+        t2 = clock()
+        call = converter.structure(raw, Call)
+        t3 = clock()
+        timings = None
+        if hook is not None:
+            timings = StageTimings(
+                call.name, read=t1 - t0, loads=t2 - t1, structure=t3 - t2
+            )
 
-        resp = await serv.process(input_adapter(payload), request)
+        if serv.is_notification(call.name):
+            await notifications.put(call, request)
+            if hook is None or timings is None:
+                return Response(status_code=202)
+            return _TimedResponse(timings, hook, status_code=202)
 
-        return Response(dumps(converter.unstructure(resp)))
+        res = await process(call, request, timings)
+        t4 = clock()
+        raw = converter.unstructure(res)
+        t5 = clock()
+        body = dumps(raw)
+        headers = None
+        if compression is not None:
+            body, headers = await compression.encode_response(
+                body, request.headers.get(ACCEPT_ENCODING)
+            )
 
-    app = Starlette(
-        debug=debug, routes=[Route(route, handler, methods=[method])]
-    )
+        if hook is None or timings is None:
+            return Response(body, headers=headers)
+        timings.unstructure = t5 - t4
+        timings.dumps = clock() - t5
+        return _TimedResponse(timings, hook, body, headers=headers)
+
+    if tracer is not None:
+        span_tracer = tracer
+        untraced_handler = handler
+
+        async def traced_handler(request: Request):
+            parent = SpanContext.from_header(request.headers.get(TRACEPARENT))
+            async with span_tracer.span(
+                route, SpanKind.SERVER, parent
+            ) as span:
+                request.scope[SPAN_KEY] = span
+                return await untraced_handler(request)
+
+        handler = traced_handler
+
+    @asynccontextmanager
+    async def lifespan(_: Starlette) -> AsyncGenerator[None, None]:
+        try:
+            yield
+        finally:
+            await notifications.close()
+            if profiler is not None:
+                profiler.close()
+
+    routes = [Route(route, handler, methods=[method])]
+
+    if metrics is not None:
+
+        async def metrics_handler(_: Request) -> Response:
+            return Response(metrics.render(), media_type=CONTENT_TYPE)
+
+        routes.append(Route(metrics_route, metrics_handler, methods=["GET"]))
+
+    if profiler is not None:
+
+        async def profiler_handler(request: Request) -> Response:
+            stacks = profiler.collapsed()
+            if "reset" in request.query_params:
+                profiler.reset()
+            return Response(stacks, media_type=PROFILE_CONTENT_TYPE)
+
+        routes.append(
+            Route(profiler_route, profiler_handler, methods=["GET"])
+        )
+
+    app = Starlette(debug=debug, routes=routes, lifespan=lifespan)
 
     return app
+
+
+class _TimedResponse(Response):
+    """A response that times its own writing, and then reports timings."""
+
+    def __init__(
+        self, timings: StageTimings, hook: TimingHook, *args, **kwargs
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.timings = timings
+        self.hook = hook
+
+    async def __call__(self, scope, receive, send) -> None:
+        start = perf_counter()
+        await super().__call__(scope, receive, send)
+        self.timings.write = perf_counter() - start
+        self.hook(self.timings)
@@ -0,0 +1,52 @@
+"""Per-stage timing instrumentation."""
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Callable, Optional
+
+import attr
+
+
+@attr.s(slots=True)
+class StageTimings:
+    """Seconds a single call spent in each stage.
+
+    On servers, `read` is reading the request body, `loads` and
+    `structure` decode it into a `Call`, `middleware` and `handler` are
+    spent in `Server.process`, `unstructure` and `dumps` encode the result
+    and `write` is writing the response. With a scheduler, `queue` is
+    waiting to be admitted.
+
+    On clients, `unstructure` and `dumps` encode the call, `write` is
+    sending it and waiting for the response, `read` is reading the
+    response body, and `loads` and `structure` decode it.
+
+    Stages that don't apply stay at zero.
+    """
+
+    method: str = attr.ib(default="")
+    read: float = attr.ib(default=0.0)
+    loads: float = attr.ib(default=0.0)
+    structure: float = attr.ib(default=0.0)
+    middleware: float = attr.ib(default=0.0)
+    handler: float = attr.ib(default=0.0)
+    unstructure: float = attr.ib(default=0.0)
+    dumps: float = attr.ib(default=0.0)
+    write: float = attr.ib(default=0.0)
+    queue: float = attr.ib(default=0.0)
+
+
+TimingHook = Callable[[StageTimings], None]
+
+current_timings: ContextVar[Optional[StageTimings]] = ContextVar(
+    "current_timings", default=None
+)
+
+
+def _no_clock() -> float:
+    return 0.0
+
+
+def stage_clock(hook: Optional[TimingHook]) -> Callable[[], float]:
+    """The clock stamping stages: `perf_counter` if there's a hook to
+    report timings to, otherwise a no-op."""
+    return perf_counter if hook is not None else _no_clock
@@ -0,0 +1,257 @@
+"""Distributed tracing.
+
+Span contexts travel between clients and servers in the W3C
+`traceparent` header.
+"""
+import re
+import sys
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from enum import Enum, unique
+from functools import lru_cache
+from random import getrandbits
+from time import time
+from typing import (
+    Any,
+    AsyncContextManager,
+    AsyncGenerator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Protocol,
+    Type,
+    TypeVar,
+)
+
+import attr
+
+from ._client import ClientAdapter
+from .wire import Call
+
+T = TypeVar("T")
+
+TRACEPARENT = "traceparent"
+# The key of the server span on Starlette scopes.
+SPAN_KEY = "pyrseia.span"
+
+_TRACEPARENT = re.compile(
+    r"([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}(-.*)?"
+)
+_INVALID_TRACE_ID = "0" * 32
+_INVALID_SPAN_ID = "0" * 16
+
+
+@attr.s(slots=True, frozen=True)
+class SpanContext:
+    trace_id: str = attr.ib()
+    span_id: str = attr.ib()
+
+    def to_header(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    @classmethod
+    def from_header(cls, value: Optional[str]) -> Optional["SpanContext"]:
+        """Parse a `traceparent` header, or None if it isn't valid."""
+        if value is None:
+            return None
+        match = _TRACEPARENT.fullmatch(value.strip())
+        if match is None:
+            return None
+        version, trace_id, span_id, rest = match.groups()
+        # Version 00 has no more fields, and version ff is forbidden.
+        if version == "ff" or (version == "00" and rest):
+            return None
+        if trace_id == _INVALID_TRACE_ID or span_id == _INVALID_SPAN_ID:
+            return None
+        return cls(trace_id, span_id)
+
+
+@unique
+class SpanKind(str, Enum):
+    CLIENT = "client"
+    SERVER = "server"
+    QUEUE = "queue"
+    HANDLER = "handler"
+
+
+@attr.s(slots=True)
+class Span:
+    name: str = attr.ib()
+    kind: SpanKind = attr.ib()
+    context: SpanContext = attr.ib()
+    parent_id: Optional[str] = attr.ib()
+    start: float = attr.ib()
+    end: Optional[float] = attr.ib(default=None)
+    error: Optional[str] = attr.ib(default=None)
+
+    @property
+    def duration(self) -> Optional[float]:
+        return None if self.end is None else self.end - self.start
+
+
+class SpanExporter(Protocol):
+    def export(self, span: Span) -> None:
+        ...
+
+
+@attr.s(slots=True)
+class InMemoryExporter:
+    """Keeps finished spans in a list, for tests."""
+
+    spans: List[Span] = attr.ib(factory=list)
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span)
+
+
+current_span: ContextVar[Optional[Span]] = ContextVar(
+    "current_span", default=None
+)
+
+
+@attr.s(slots=True, frozen=True)
+class Tracer:
+    exporter: SpanExporter = attr.ib()
+
+    def start_span(
+        self,
+        name: str,
+        kind: SpanKind,
+        parent: Optional[SpanContext] = None,
+        start: Optional[float] = None,
+    ) -> Span:
+        if parent is None:
+            context = SpanContext(_new_id(128), _new_id(64))
+            parent_id = None
+        else:
+            context = SpanContext(parent.trace_id, _new_id(64))
+            parent_id = parent.span_id
+        return Span(
+            name,
+            kind,
+            context,
+            parent_id,
+            start if start is not None else time(),
+        )
+
+    def end_span(
+        self, span: Span, exc: Optional[BaseException] = None
+    ) -> None:
+        span.end = time()
+        if exc is not None:
+            span.error = repr(exc)
+        self.exporter.export(span)
+
+    @asynccontextmanager
+    async def span(
+        self,
+        name: str,
+        kind: SpanKind,
+        parent: Optional[SpanContext] = None,
+        start: Optional[float] = None,
+    ) -> AsyncGenerator[Span, None]:
+        """Run a block in a span, making it the current span."""
+        span = self.start_span(name, kind, parent, start)
+        token = current_span.set(span)
+        try:
+            yield span
+        except BaseException as exc:
+            current_span.reset(token)
+            self.end_span(span, exc)
+            raise
+        current_span.reset(token)
+        self.end_span(span)
+
+
+# The tracer of the call being processed, for tracing its stages.
+current_tracer: ContextVar[Optional[Tracer]] = ContextVar(
+    "current_tracer", default=None
+)
+
+
+def _new_id(bits: int) -> str:
+    return f"{getrandbits(bits):0{bits // 4}x}"
+
+
+def trace_headers() -> Optional[Dict[str, str]]:
+    """The headers propagating the current span, if any."""
+    span = current_span.get()
+    if span is None:
+        return None
+    return {TRACEPARENT: span.context.to_header()}
+
+
+@lru_cache(maxsize=None)
+def aiohttp_span_key() -> Any:
+    """The key of the server span on aiohttp requests."""
+    try:
+        from aiohttp.web import RequestKey
+    except ImportError:  # aiohttp < 3.11
+        return SPAN_KEY
+    return RequestKey(SPAN_KEY, Span)
+
+
+def request_span(req_ctx: Any) -> Optional[Span]:
+    """The server span of an aiohttp or Starlette request."""
+    get = getattr(req_ctx, "get", None)
+    if get is None:
+        return None
+    span = get(SPAN_KEY)
+    # Any aiohttp request means aiohttp has been imported.
+    if span is None and "aiohttp.web" in sys.modules:
+        span = get(aiohttp_span_key())
+    return span
+
+
+def traced_process(
+    tracer: Tracer, process: Callable[..., Awaitable[Any]]
+) -> Callable[..., Awaitable[Any]]:
+    """Wrap `Server.process`, running calls in handler spans.
+
+    Calls waiting for a server's scheduler get a queue span too.
+    """
+
+    async def traced(call: Call, req_ctx: Any, *args: Any) -> Any:
+        parent = current_span.get()
+        if parent is not None and parent.kind is SpanKind.SERVER:
+            parent.name = call.name
+        token = current_tracer.set(tracer)
+        try:
+            async with tracer.span(
+                call.name,
+                SpanKind.HANDLER,
+                parent.context if parent is not None else None,
+            ):
+                return await process(call, req_ctx, *args)
+        finally:
+            current_tracer.reset(token)
+
+    return traced
+
+
+def tracing_client_adapter(
+    network_adapter: AsyncContextManager[ClientAdapter], tracer: Tracer
+) -> AsyncContextManager[ClientAdapter]:
+    """Wrap a network adapter, running calls in client spans.
+
+    The aiohttp and httpx adapters propagate the client span to servers.
+    """
+
+    @asynccontextmanager
+    async def adapter() -> AsyncGenerator[ClientAdapter, None]:
+        async with network_adapter as inner:
+
+            async def sender(call: Call, resp_type: Type[T]) -> T:
+                parent = current_span.get()
+                async with tracer.span(
+                    call.name,
+                    SpanKind.CLIENT,
+                    parent.context if parent is not None else None,
+                ):
+                    return await inner(call, resp_type)
+
+            yield sender
+
+    return adapter()
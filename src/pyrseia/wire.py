@@ -2,6 +2,10 @@
 from typing import Any, Tuple
 
 import attr
+from cattr import Converter
+
+# (Un)structures calls and their results, for all adapters.
+converter = Converter()
 
 
 @attr.s(slots=True, frozen=True)
@@ -1,4 +1,13 @@
-from typing import Dict
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Union
 
 def dumps(obj: Dict) -> bytes: ...
-def loads(payload: bytes) -> Dict: ...
+def loads(payload: Union[bytes, memoryview]) -> Dict: ...
+
+class Packer:
+    def pack(self, obj: Any) -> bytes: ...
+
+class Unpacker:
+    def __init__(
+        self, file_like: Optional[BinaryIO] = ..., raw: bool = ...
+    ) -> None: ...
+    def __iter__(self) -> Iterator[Any]: ...
@@ -1,6 +1,6 @@
 from typing import Optional
 
-from pyrseia import rpc
+from pyrseia import idempotent, notification, rpc
 
 
 class Calculator:
@@ -12,10 +12,12 @@ class Calculator:
     async def call_one(self, i: int) -> int:
         ...
 
+    @idempotent
     @rpc
     async def add(self, a: int, b: int) -> int:
         ...
 
+    @idempotent
     @rpc
     async def multiply(self, a: int, b: int) -> int:
         ...
@@ -34,11 +36,17 @@ class Calculator:
     ) -> Optional[str]:
         ...
 
+    @notification
+    @rpc
+    async def notify(self, i: int) -> None:
+        ...
+
     async def non_rpc(self, i: int) -> int:
         return 1
 
 
 class Calc2Rpc:
+    @idempotent
     @rpc
     async def add(self, a: int, b: int) -> int:
         ...
@@ -0,0 +1,54 @@
+import pytest  # type: ignore
+from msgpack import dumps
+
+from pyrseia.asgi import AsgiRequest, create_asgi_app
+
+from .calculator import Calculator
+
+
+def http_scope() -> dict:
+    return {
+        "type": "http",
+        "method": "POST",
+        "path": "/",
+        "headers": [(b"content-type", b"application/msgpack")],
+    }
+
+
+@pytest.mark.asyncio
+async def test_disconnect(calculator_server_creator) -> None:
+    """Requests whose client disconnects mid-body aren't processed."""
+    serv = calculator_server_creator(AsgiRequest)
+    calls = []
+
+    @serv.implement(Calculator.call_one)
+    async def call_one(i: int) -> int:
+        calls.append(i)
+        return i
+
+    app = create_asgi_app(serv)
+    body = dumps({"name": "call_one", "args": [1]})
+    messages = [
+        {"type": "http.request", "body": body[:3], "more_body": True},
+        {"type": "http.disconnect"},
+    ]
+    sent: list = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    await app(http_scope(), receive, send)
+
+    assert calls == []
+    assert sent == []
+
+
+def test_headers() -> None:
+    """Headers are decoded once."""
+    request = AsgiRequest(http_scope())
+
+    assert request.headers == {"content-type": "application/msgpack"}
+    assert request.headers is request.headers
@@ -0,0 +1,50 @@
+from asyncio import sleep
+
+import pytest  # type: ignore
+
+from pyrseia.batch import bounded_map
+
+
+@pytest.mark.asyncio
+async def test_bounded_map() -> None:
+    """At most `concurrency` calls run at once, results come as they end."""
+    running = 0
+    max_running = 0
+
+    async def fn(i: int) -> int:
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await sleep(0.001 * (5 - i))
+        running -= 1
+        return i
+
+    res = [i async for i in bounded_map(fn, range(5), 2)]
+
+    assert sorted(res) == list(range(5))
+    assert res[0] == 1
+    assert max_running == 2
+
+
+@pytest.mark.asyncio
+async def test_bounded_map_stop() -> None:
+    """Calls still running are cancelled when iteration stops."""
+    cancelled = 0
+
+    async def fn(i: int) -> int:
+        nonlocal cancelled
+        try:
+            await sleep(0 if i == 0 else 1)
+        except BaseException:
+            cancelled += 1
+            raise
+        return i
+
+    results = bounded_map(fn, range(4), 4)
+    async for i in results:
+        assert i == 0
+        break
+    await results.aclose()  # type: ignore
+    await sleep(0)
+
+    assert cancelled == 3
@@ -0,0 +1,52 @@
+from asyncio import sleep
+
+import pytest  # type: ignore
+
+from pyrseia._bench import LatencyHistogram, generate_load
+from pyrseia.__main__ import _default_to_call
+
+
+def test_histogram() -> None:
+    h = LatencyHistogram()
+    for us in range(1, 1001):
+        h.record(us / 1_000_000)
+
+    assert h.count == 1000
+    assert h.percentile(50) == pytest.approx(0.0005, rel=0.01)
+    assert h.percentile(99) == pytest.approx(0.00099, rel=0.01)
+    assert h.percentile(100) == 0.001
+
+
+@pytest.mark.asyncio
+async def test_generate_load() -> None:
+    """Both closed and open loop load counts calls and errors."""
+    calls = 0
+
+    async def fn() -> None:
+        nonlocal calls
+        calls += 1
+        n = calls
+        await sleep(0.001)
+        if n % 2:
+            raise ValueError()
+
+    report = await generate_load(fn, 0.1, concurrency=2)
+    assert report.calls == calls
+    assert report.errors["ValueError"] == (calls + 1) // 2
+
+    calls = 0
+    report = await generate_load(fn, 0.1, concurrency=2, rate=100)
+    assert calls == report.calls == 10
+
+
+def test_default_command() -> None:
+    """The original bare form of the CLI still invokes a method."""
+    assert _default_to_call(["m:f", "f(1)"]) == ["call", "m:f", "f(1)"]
+    assert _default_to_call(["-i", "m:f", "f()"]) == [
+        "call",
+        "-i",
+        "m:f",
+        "f()",
+    ]
+    assert _default_to_call(["bench", "m:f", "f()"]) == ["bench", "m:f", "f()"]
+    assert _default_to_call(["--help"]) == ["--help"]
@@ -0,0 +1,99 @@
+from asyncio import sleep
+from contextlib import asynccontextmanager
+
+import pytest  # type: ignore
+
+from pyrseia import close_client, create_client
+from pyrseia.breaker import (
+    BreakerPolicy,
+    CircuitBreaker,
+    CircuitOpenError,
+    CircuitState,
+    circuit_breaker_client_adapter,
+)
+from pyrseia.wire import Call
+
+from .calculator import Calculator
+
+
+@pytest.mark.asyncio
+async def test_open_and_close() -> None:
+    """Circuits open on failures, and close after successful probes."""
+    calls = []
+    failing = True
+
+    @asynccontextmanager
+    async def network_adapter():
+        async def sender(call: Call, _):
+            calls.append(call.name)
+            if failing:
+                raise ConnectionResetError()
+            return sum(call.args)
+
+        yield sender
+
+    breaker = CircuitBreaker(
+        "calc",
+        BreakerPolicy(min_calls=2, open_duration=0.05, half_open_probes=1),
+    )
+    t = await create_client(
+        Calculator, circuit_breaker_client_adapter(network_adapter(), breaker)
+    )
+
+    for _ in range(2):
+        with pytest.raises(ConnectionResetError):
+            await t.add(1, 2)
+
+    assert breaker.circuit("add").state is CircuitState.OPEN
+
+    with pytest.raises(CircuitOpenError):
+        await t.add(1, 2)
+    assert len(calls) == 2
+
+    # Other methods have their own circuits.
+    with pytest.raises(ConnectionResetError):
+        await t.multiply(1, 2)
+
+    failing = False
+    await sleep(0.05)
+
+    assert await t.add(1, 2) == 3
+    assert breaker.circuit("add").state is CircuitState.CLOSED
+
+    await close_client(t)
+
+
+@pytest.mark.asyncio
+async def test_slow_calls() -> None:
+    """Circuits open when too many calls are slower than the threshold."""
+    calls = []
+
+    @asynccontextmanager
+    async def network_adapter():
+        async def sender(call: Call, _):
+            calls.append(call.name)
+            await sleep(0.02)
+            return sum(call.args)
+
+        yield sender
+
+    breaker = CircuitBreaker(
+        "calc",
+        BreakerPolicy(
+            min_calls=2, slow_call_duration=0.01, slow_call_rate=1.0
+        ),
+    )
+    t = await create_client(
+        Calculator, circuit_breaker_client_adapter(network_adapter(), breaker)
+    )
+
+    assert await t.add(1, 2) == 3
+    assert breaker.circuit("add").state is CircuitState.CLOSED
+    assert await t.add(1, 2) == 3
+    assert breaker.circuit("add").state is CircuitState.OPEN
+
+    with pytest.raises(CircuitOpenError):
+        await t.add(1, 2)
+    assert len(calls) == 2
+
+    await close_client(t)
@@ -0,0 +1,165 @@
+from asyncio import Event, all_tasks, current_task, sleep
+from contextlib import asynccontextmanager
+from typing import List
+
+import pytest  # type: ignore
+
+from pyrseia import close_client, create_client, rpc
+from pyrseia.cache import (
+    CachePolicy,
+    ResponseCache,
+    cacheable,
+    encoded_size,
+)
+from pyrseia.wire import Call
+
+
+class ReferenceData:
+    @cacheable(ttl=0.05, stale_while_revalidate=0.1)
+    @rpc
+    async def get_country(self, code: str) -> str:
+        ...
+
+    @rpc
+    async def get_time(self) -> int:
+        ...
+
+    @cacheable(ttl=1)
+    @rpc
+    async def get_rate(self, amount: float) -> int:
+        ...
+
+
+def counting_adapter(calls: List[Call]):
+    @asynccontextmanager
+    async def adapter():
+        async def sender(call: Call, _):
+            calls.append(call)
+            return len(calls)
+
+        yield sender
+
+    return adapter()
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.mark.asyncio
+async def test_caching() -> None:
+    """Cacheable methods are cached, and revalidated in the background."""
+    calls: List[Call] = []
+    clock = Clock()
+    t = await create_client(
+        ReferenceData,
+        counting_adapter(calls),
+        cache=ResponseCache(clock=clock),
+    )
+
+    assert await t.get_country("hr") == 1
+    assert await t.get_country("hr") == 1
+    assert await t.get_country("de") == 2
+    assert await t.get_time() == 3
+    assert await t.get_time() == 4
+
+    clock.now = 0.06
+
+    # Stale, but still returned while a refresh is made.
+    assert await t.get_country("hr") == 1
+    await sleep(0)
+    assert len(calls) == 5
+    assert await t.get_country("hr") == 5
+
+    clock.now = 0.3
+
+    # Expired.
+    assert await t.get_country("hr") == 6
+
+    await close_client(t)
+
+
+@pytest.mark.asyncio
+async def test_key_types() -> None:
+    """Equal arguments of different types are cached apart."""
+    calls: List[Call] = []
+    t = await create_client(
+        ReferenceData, counting_adapter(calls), cache=ResponseCache()
+    )
+
+    assert await t.get_rate(1) == 1
+    assert await t.get_rate(1.0) == 2
+    assert await t.get_rate(True) == 3
+    assert await t.get_rate(1.0) == 2
+
+    await close_client(t)
+
+
+@pytest.mark.asyncio
+async def test_close_cancels_refreshes() -> None:
+    """Closing a client cancels its cache's background refreshes."""
+    refreshing = Event()
+
+    @asynccontextmanager
+    async def adapter():
+        async def sender(call: Call, _):
+            if refreshing.is_set():
+                await sleep(10)
+            return 1
+
+        yield sender
+
+    clock = Clock()
+    t = await create_client(
+        ReferenceData, adapter(), cache=ResponseCache(clock=clock)
+    )
+    assert await t.get_country("hr") == 1
+    clock.now = 0.06
+    refreshing.set()
+    assert await t.get_country("hr") == 1
+    tasks = [task for task in all_tasks() if task is not current_task()]
+    assert len(tasks) == 1
+
+    await close_client(t)
+    await sleep(0)
+
+    assert tasks[0].cancelled()
+
+
+def test_eviction() -> None:
+    """The cache evicts the least recently used entries by weight."""
+    cache = ResponseCache(max_weight=10, weigher=len)
+    policy = CachePolicy(ttl=10)
+
+    cache.put("a", "12345", policy)
+    cache.put("b", "12345", policy)
+    assert len(cache) == 2
+
+    cache.put("c", "1", policy)
+    assert len(cache) == 2
+    assert cache.size == 6
+
+    cache.put("d", "12345678901", policy)
+    assert len(cache) == 2
+
+    # Entries weigh 1 by default.
+    cache = ResponseCache(max_weight=2)
+    for key in "abc":
+        cache.put(key, "12345", policy)
+    assert len(cache) == 2
+    assert cache.size == 2
+
+    # encoded_size weighs results by their msgpack encoding.
+    cache = ResponseCache(max_weight=20, weigher=encoded_size)
+    cache.put("a", "x" * 10, policy)
+    cache.put("b", ["x", "y"], policy)
+    assert cache.size == 11 + 5
+    cache.put("c", "x" * 5, policy)
+    assert len(cache) == 2
+    assert cache.size == 5 + 6
+    cache.put("d", b"x" * 100, policy)
+    assert len(cache) == 2
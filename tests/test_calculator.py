@@ -1,4 +1,4 @@
-from asyncio import Event, create_task
+from asyncio import Event, create_task, sleep
 
 import pytest  # type: ignore
 from aiohttp.web import AppRunner
@@ -10,6 +10,7 @@ from starlette.requests import Request as StarletteRequest
 
 from pyrseia import Server, close_client, create_client
 from pyrseia.aiohttp import aiohttp_client_adapter, create_aiohttp_app
+from pyrseia.asgi import AsgiRequest, create_asgi_app
 from pyrseia.httpx import httpx_client_adapter
 from pyrseia.starlette import create_starlette_app
 
@@ -82,6 +83,12 @@ async def test_httpx_starlette(
         assert ctx.method == "POST"
         return 1
 
+    notified = Event()
+
+    @serv.implement(Calculator.notify)
+    async def notify(i: int) -> None:
+        notified.set()
+
     app = create_starlette_app(serv)
 
     config = Config()
@@ -93,8 +100,6 @@ async def test_httpx_starlette(
 
     task = create_task(serve(app, config, shutdown_trigger=shutdown_trigger))
 
-    from asyncio import sleep
-
     await sleep(0.1)  # Wait for the server to start up.
 
     t = await create_client(
@@ -103,6 +108,8 @@ async def test_httpx_starlette(
     )
     r = await t.add(1, 2)
     await t.call_none()
+    await t.notify(1)
+    await notified.wait()
 
     assert r == 3
 
@@ -111,3 +118,92 @@ async def test_httpx_starlette(
     shutdown_event.set()
 
     await task
+
+
+@pytest.mark.asyncio
+async def test_httpx_asgi(
+    unused_tcp_port: int, calculator_server_creator
+) -> None:
+    """Test the httpx client/bare ASGI server combo."""
+    serv: Server[Calculator, AsgiRequest] = calculator_server_creator(
+        AsgiRequest
+    )
+
+    @serv.implement(Calculator.call_none)
+    async def call_none(ctx: AsgiRequest) -> int:
+        assert ctx.method == "POST"
+        assert "content-length" in ctx.headers
+        return 1
+
+    done = []
+
+    @serv.implement(Calculator.notify)
+    async def notify(i: int) -> None:
+        done.append(i)
+
+    app = create_asgi_app(serv)
+
+    config = Config()
+    config.bind = [f"localhost:{unused_tcp_port}"]
+    shutdown_event = Event()
+
+    task = create_task(
+        serve(app, config, shutdown_trigger=shutdown_event.wait)  # type: ignore
+    )
+
+    await sleep(0.1)  # Wait for the server to start up.
+
+    t = await create_client(
+        Calculator,
+        httpx_client_adapter(f"http://localhost:{unused_tcp_port}"),
+    )
+    assert await t.add(1, 2) == 3
+    assert await t.call_none() == 1
+    await t.notify(1)
+
+    await close_client(t)
+
+    shutdown_event.set()
+    await task
+
+    # Lifespan shutdown waits for queued notifications.
+    assert done == [1]
+
+
+@pytest.mark.asyncio
+async def test_aiohttp_notification(
+    unused_tcp_port: int, calculator_server_creator
+) -> None:
+    """Notifications are acknowledged before they run."""
+    serv = calculator_server_creator(AioRequest)
+    started = Event()
+    proceed = Event()
+    done = []
+
+    @serv.implement(Calculator.notify)
+    async def notify(i: int) -> None:
+        started.set()
+        await proceed.wait()
+        done.append(i)
+
+    app = create_aiohttp_app(serv)
+
+    runner = AppRunner(app)
+    await runner.setup()
+    site = TCPSite(runner, port=unused_tcp_port)
+    await site.start()
+
+    t = await create_client(
+        Calculator,
+        aiohttp_client_adapter(f"http://localhost:{unused_tcp_port}"),
+    )
+    await t.notify(1)
+    await started.wait()
+    assert done == []
+
+    proceed.set()
+    await close_client(t)
+    # Cleanup waits for queued notifications.
+    await runner.cleanup()
+
+    assert done == [1]
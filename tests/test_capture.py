@@ -0,0 +1,127 @@
+import logging
+from os import path
+from time import perf_counter
+
+import pytest  # type: ignore
+
+from pyrseia.capture import Record, TrafficRecorder, read_log, replay
+from pyrseia.wire import Call
+
+
+@pytest.mark.asyncio
+async def test_record_and_read(tmp_path, calculator_server_creator) -> None:
+    log = str(tmp_path / "traffic.log")
+    recorder = TrafficRecorder(log, record_responses=True, flush_every=2)
+    serv = calculator_server_creator(None, middleware=[recorder.middleware])
+
+    for i in range(5):
+        await serv.process(Call("call_one", (i,)), None)
+    executor = recorder._executor
+    await recorder.close()
+    # The writer thread is stopped.
+    assert not any(t.is_alive() for t in executor._threads)
+
+    records = list(read_log(log))
+    assert [(r.name, r.args, r.response) for r in records] == [
+        ("call_one", (i,), i) for i in range(5)
+    ]
+    assert all(r.duration >= 0 for r in records)
+
+
+@pytest.mark.asyncio
+async def test_rotation(tmp_path, calculator_server_creator) -> None:
+    """Full logs are rotated, keeping `backup_count` backups."""
+    log = str(tmp_path / "traffic.log")
+    recorder = TrafficRecorder(
+        log, max_bytes=100, backup_count=2, flush_every=1
+    )
+    serv = calculator_server_creator(None, middleware=[recorder.middleware])
+
+    for i in range(50):
+        await serv.process(Call("add", (i, i)), None)
+        await recorder.flush()
+    await recorder.close()
+
+    assert path.exists(f"{log}.1")
+    assert path.exists(f"{log}.2")
+    assert not path.exists(f"{log}.3")
+    assert path.getsize(log) <= 100
+    assert list(read_log(log))[-1].args == (49, 49)
+
+
+@pytest.mark.asyncio
+async def test_dropped(tmp_path, calculator_server_creator) -> None:
+    log = str(tmp_path / "traffic.log")
+    recorder = TrafficRecorder(log, flush_every=100, max_pending=3)
+    serv = calculator_server_creator(None, middleware=[recorder.middleware])
+
+    for i in range(5):
+        await serv.process(Call("call_one", (i,)), None)
+    await recorder.close()
+
+    assert recorder.dropped == 2
+    assert len(list(read_log(log))) == 3
+
+
+@pytest.mark.asyncio
+async def test_failed_writes(
+    tmp_path, calculator_server_creator, caplog
+) -> None:
+    """Records lost to failed writes are counted and logged."""
+    log = str(tmp_path / "missing" / "traffic.log")
+    recorder = TrafficRecorder(log, flush_every=2)
+    serv = calculator_server_creator(None, middleware=[recorder.middleware])
+
+    for i in range(3):
+        await serv.process(Call("call_one", (i,)), None)
+    await recorder.close()
+
+    assert recorder.dropped == 3
+    assert [r.levelno for r in caplog.records] == [logging.ERROR] * 2
+
+
+@pytest.mark.asyncio
+async def test_replay() -> None:
+    records = [
+        Record(float(i), "add" if i % 2 else "call_one", (i,), 0.001)
+        for i in range(10)
+    ]
+    replayed = []
+
+    async def call(name, args):
+        replayed.append((name, args))
+        if args == (3,):
+            raise ValueError()
+
+    res = await replay(records, call, speed=None, concurrency=4)
+
+    assert sorted(replayed) == sorted((r.name, r.args) for r in records)
+    assert res["add"].recorded.count == 5
+    assert res["add"].replayed.count == 4
+    assert res["add"].errors == 1
+    assert res["call_one"].replayed.count == 5
+
+    replayed.clear()
+    res = await replay(records[:3], call, speed=100.0)
+    assert replayed == [(r.name, r.args) for r in records[:3]]
+
+
+@pytest.mark.asyncio
+async def test_replay_order() -> None:
+    """Timed replays follow arrival order, not log order."""
+    # A slow call logged after a fast one that arrived later.
+    records = [
+        Record(0.02, "fast", (), 0.001),
+        Record(0.0, "slow", (), 0.05),
+        Record(0.03, "fast", (), 0.001),
+    ]
+    replayed = []
+    begin = perf_counter()
+
+    async def call(name, args):
+        replayed.append((name, perf_counter() - begin))
+
+    await replay(records, call, speed=1.0)
+
+    assert [name for name, _ in replayed] == ["slow", "fast", "fast"]
+    assert replayed[1][1] >= 0.02
@@ -0,0 +1,291 @@
+import zlib
+from asyncio import Event, create_task, sleep
+
+import pytest  # type: ignore
+from httpx import AsyncClient
+from aiohttp.web import AppRunner
+from aiohttp.web import Request as AioRequest
+from aiohttp.web import TCPSite
+from hypercorn.asyncio import serve
+from hypercorn.config import Config
+from starlette.requests import Request as StarletteRequest
+
+from pyrseia import close_client, create_client
+from pyrseia.aiohttp import aiohttp_client_adapter, create_aiohttp_app
+from pyrseia.compression import (
+    DEFLATE,
+    GZIP,
+    BodyTooLargeError,
+    Codec,
+    Compression,
+    UnsupportedEncodingError,
+)
+from pyrseia.httpx import httpx_client_adapter
+from pyrseia.starlette import create_starlette_app
+
+from .calculator import Calculator
+
+
+def counting_codec(counts):
+    """A zlib codec, counting its uses."""
+
+    def compress(data: bytes) -> bytes:
+        counts.append("compress")
+        return zlib.compress(data)
+
+    def decompress(data: bytes, max_size: int) -> bytes:
+        counts.append("decompress")
+        return DEFLATE.decompress(data, max_size)
+
+    return Codec("x-counted", compress, decompress)
+
+
+def test_negotiate() -> None:
+    compression = Compression((DEFLATE, GZIP))
+
+    assert compression.accept_encoding == "deflate, gzip"
+    assert compression.negotiate(None) is None
+    assert compression.negotiate("br") is None
+    assert compression.negotiate("gzip, deflate") is DEFLATE
+    assert compression.negotiate("gzip, deflate;q=0") is GZIP
+    assert compression.negotiate("*") is DEFLATE
+    assert compression.negotiate("*, deflate;q=0") is GZIP
+    assert compression.negotiate("*, deflate;q=0, gzip;q=0") is None
+
+
+@pytest.mark.asyncio
+async def test_compress() -> None:
+    """Only large enough bodies are compressed, large ones off the loop."""
+    compression = Compression(min_size=10, offload_size=1000)
+
+    assert await compression.compress(b"small", DEFLATE) == (b"small", None)
+    for size in (100, 10_000):
+        body = b"a" * size
+        compressed, coding = await compression.compress(body, DEFLATE)
+        assert coding == "deflate"
+        assert len(compressed) < size
+        assert await compression.decompress(compressed, "deflate") == body
+    assert await compression.decompress(b"body", None) == b"body"
+    assert await compression.decompress(b"body", "identity") == b"body"
+    with pytest.raises(UnsupportedEncodingError):
+        await compression.decompress(b"body", "br")
+
+
+@pytest.mark.asyncio
+async def test_decompression_limit() -> None:
+    """Bodies inflating past the limit are rejected, whatever their coding."""
+    compression = Compression(max_decompressed_size=100_000, offload_size=0)
+    body = b"a" * 100_000
+    bomb = b"a" * 100_001
+    multi = GZIP.compress(body[:50_000]) + GZIP.compress(body[50_000:])
+    for codec in (DEFLATE, GZIP):
+        compressed = codec.compress(body)
+        assert await compression.decompress(compressed, codec.name) == body
+        with pytest.raises(BodyTooLargeError):
+            await compression.decompress(codec.compress(bomb), codec.name)
+        with pytest.raises(zlib.error):
+            await compression.decompress(compressed[:-10], codec.name)
+    assert await compression.decompress(multi, "gzip") == body
+    with pytest.raises(BodyTooLargeError):
+        await compression.decompress(multi + GZIP.compress(b"a"), "gzip")
+
+
+@pytest.mark.asyncio
+async def test_decompression_bomb(
+    unused_tcp_port: int, calculator_server_creator
+) -> None:
+    """Servers answer requests inflating past the limit with a 413."""
+    # aiohttp's parser inflates deflate bodies itself, so use another name.
+    codec = Codec("x-deflate", zlib.compress, DEFLATE.decompress)
+    compression = Compression((codec,), max_decompressed_size=100_000)
+    bomb = zlib.compress(b"\0" * 10_000_000)
+    url = f"http://localhost:{unused_tcp_port}"
+
+    async def post() -> int:
+        async with AsyncClient() as client:
+            res = await client.post(
+                url, content=bomb, headers={"Content-Encoding": "x-deflate"}
+            )
+        return res.status_code
+
+    runner = AppRunner(
+        create_aiohttp_app(
+            calculator_server_creator(AioRequest), compression=compression
+        )
+    )
+    await runner.setup()
+    site = TCPSite(runner, port=unused_tcp_port)
+    await site.start()
+    assert await post() == 413
+    await runner.cleanup()
+
+    app = create_starlette_app(
+        calculator_server_creator(StarletteRequest), compression=compression
+    )
+    config = Config()
+    config.bind = [f"localhost:{unused_tcp_port}"]
+    shutdown_event = Event()
+    task = create_task(
+        serve(app, config, shutdown_trigger=shutdown_event.wait)  # type: ignore
+    )
+    await sleep(0.1)  # Wait for the server to start up.
+    assert await post() == 413
+    shutdown_event.set()
+    await task
+
+
+@pytest.mark.asyncio
+async def test_aiohttp_compression(
+    unused_tcp_port: int, calculator_server_creator
+) -> None:
+    counts: list = []
+    compression = Compression((counting_codec(counts), DEFLATE))
+    serv = calculator_server_creator(AioRequest)
+
+    @serv.implement(Calculator.call_four)
+    async def call_four(i: int, s: str, f: float, b: bytes) -> bytes:
+        return b * i
+
+    app = create_aiohttp_app(serv, compression=compression)
+    runner = AppRunner(app)
+    await runner.setup()
+    site = TCPSite(runner, port=unused_tcp_port)
+    await site.start()
+
+    url = f"http://localhost:{unused_tcp_port}"
+    for client_compression in (compression, Compression((DEFLATE,))):
+        t = await create_client(
+            Calculator,
+            aiohttp_client_adapter(url, compression=client_compression),
+        )
+        assert await t.add(1, 2) == 3
+        assert await t.call_four(2, "", 0.0, b"a" * 10_000) == b"a" * 20_000
+        await close_client(t)
+
+    await runner.cleanup()
+
+    # Only the large request and response were compressed.
+    assert counts == ["compress", "decompress", "compress", "decompress"]
+
+
+@pytest.mark.asyncio
+async def test_httpx_starlette_compression(
+    unused_tcp_port: int, calculator_server_creator
+) -> None:
+    counts: list = []
+    compression = Compression((counting_codec(counts),), offload_size=0)
+    serv = calculator_server_creator(StarletteRequest)
+
+    @serv.implement(Calculator.call_four)
+    async def call_four(i: int, s: str, f: float, b: bytes) -> bytes:
+        return b * i
+
+    app = create_starlette_app(serv, compression=compression)
+
+    config = Config()
+    config.bind = [f"localhost:{unused_tcp_port}"]
+    shutdown_event = Event()
+    task = create_task(
+        serve(app, config, shutdown_trigger=shutdown_event.wait)  # type: ignore
+    )
+    await sleep(0.1)  # Wait for the server to start up.
+
+    t = await create_client(
+        Calculator,
+        httpx_client_adapter(
+            f"http://localhost:{unused_tcp_port}", compression=compression
+        ),
+    )
+    # The first request goes out before the server advertised its codecs.
+    for _ in range(2):
+        assert await t.call_four(2, "", 0.0, b"a" * 10_000) == b"a" * 20_000
+    await close_client(t)
+
+    shutdown_event.set()
+    await task
+
+    assert counts == ["compress", "decompress"] + [
+        "compress",
+        "decompress",
+        "compress",
+        "decompress",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_uncompressed_server(
+    unused_tcp_port: int, calculator_server_creator
+) -> None:
+    """Clients don't compress requests to servers without compression."""
+    serv = calculator_server_creator(StarletteRequest)
+
+    @serv.implement(Calculator.call_four)
+    async def call_four(i: int, s: str, f: float, b: bytes) -> bytes:
+        return b * i
+
+    app = create_starlette_app(serv)
+
+    config = Config()
+    config.bind = [f"localhost:{unused_tcp_port}"]
+    shutdown_event = Event()
+    task = create_task(
+        serve(app, config, shutdown_trigger=shutdown_event.wait)  # type: ignore
+    )
+    await sleep(0.1)  # Wait for the server to start up.
+
+    url = f"http://localhost:{unused_tcp_port}"
+    for adapter in (httpx_client_adapter, aiohttp_client_adapter):
+        t = await create_client(
+            Calculator, adapter(url, compression=Compression())
+        )
+        for _ in range(2):
+            assert await t.call_four(1, "", 0.0, b"a" * 5000) == b"a" * 5000
+        await close_client(t)
+
+    shutdown_event.set()
+    await task
+
+
+@pytest.mark.asyncio
+async def test_dropped_codec(
+    unused_tcp_port: int, calculator_server_creator
+) -> None:
+    """Calls a server refuses for a codec it dropped are sent again."""
+    serv = calculator_server_creator(StarletteRequest)
+
+    @serv.implement(Calculator.call_four)
+    async def call_four(i: int, s: str, f: float, b: bytes) -> bytes:
+        return b * i
+
+    deflate_app = create_starlette_app(
+        serv, compression=Compression((DEFLATE,))
+    )
+    gzip_app = create_starlette_app(serv, compression=Compression((GZIP,)))
+    apps = [deflate_app]
+
+    async def app(scope, receive, send) -> None:
+        await apps[0](scope, receive, send)
+
+    config = Config()
+    config.bind = [f"localhost:{unused_tcp_port}"]
+    shutdown_event = Event()
+    task = create_task(
+        serve(app, config, shutdown_trigger=shutdown_event.wait)  # type: ignore
+    )
+    await sleep(0.1)  # Wait for the server to start up.
+
+    url = f"http://localhost:{unused_tcp_port}"
+    for adapter in (httpx_client_adapter, aiohttp_client_adapter):
+        apps[0] = deflate_app
+        t = await create_client(
+            Calculator, adapter(url, compression=Compression((DEFLATE,)))
+        )
+        for _ in range(2):
+            assert await t.call_four(1, "", 0.0, b"a" * 5000) == b"a" * 5000
+        apps[0] = gzip_app
+        for _ in range(2):
+            assert await t.call_four(1, "", 0.0, b"a" * 5000) == b"a" * 5000
+        await close_client(t)
+
+    shutdown_event.set()
+    await task
@@ -0,0 +1,82 @@
+from asyncio import gather, sleep
+from contextlib import asynccontextmanager
+
+import pytest  # type: ignore
+
+from pyrseia import close_client, create_client
+from pyrseia.limiter import (
+    AIMDLimit,
+    GradientLimit,
+    LimitExceededError,
+    Limiter,
+    limiting_client_adapter,
+)
+from pyrseia.wire import Call
+
+from .calculator import Calculator
+
+
+@pytest.mark.asyncio
+async def test_queueing_and_rejection() -> None:
+    """Calls over the limit queue, and calls over the queue are rejected."""
+    in_flight = 0
+    max_in_flight = 0
+
+    @asynccontextmanager
+    async def network_adapter():
+        async def sender(call: Call, _):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await sleep(0.01)
+            in_flight -= 1
+            return sum(call.args)
+
+        yield sender
+
+    limiter = Limiter(AIMDLimit(limit=2, max_limit=2), max_queue=2)
+    t = await create_client(
+        Calculator, limiting_client_adapter(network_adapter(), limiter)
+    )
+
+    res = await gather(
+        *(t.add(i, 1) for i in range(5)), return_exceptions=True
+    )
+
+    assert res[:4] == [1, 2, 3, 4]
+    assert isinstance(res[4], LimitExceededError)
+    assert max_in_flight == 2
+    assert limiter.in_flight == 0
+
+    await close_client(t)
+
+
+def test_aimd() -> None:
+    """AIMD grows while healthy and backs off on errors."""
+    limit = AIMDLimit(limit=10, timeout=1.0)
+
+    limit.update(0.1, 10, False)
+    assert limit.limit == 11
+
+    limit.update(0.1, 1, False)
+    assert limit.limit == 11
+
+    limit.update(0.1, 10, True)
+    assert limit.limit == 9
+
+    limit.update(2.0, 10, False)
+    assert limit.limit == 8
+
+
+def test_gradient() -> None:
+    """The gradient limit shrinks when latency rises."""
+    limit = GradientLimit(limit=20)
+
+    for _ in range(10):
+        limit.update(0.1, 20, False)
+    healthy = limit.limit
+    assert healthy > 20
+
+    for _ in range(10):
+        limit.update(1.0, healthy, False)
+    assert limit.limit < healthy
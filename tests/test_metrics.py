@@ -0,0 +1,81 @@
+import pytest  # type: ignore
+from aiohttp import ClientSession
+from aiohttp.web import AppRunner
+from aiohttp.web import Request as AioRequest
+from aiohttp.web import TCPSite
+
+from pyrseia import close_client, create_client
+from pyrseia.aiohttp import aiohttp_client_adapter, create_aiohttp_app
+from pyrseia.metrics import Metrics
+from pyrseia.wire import Call
+
+from .calculator import Calculator
+
+
+@pytest.mark.asyncio
+async def test_metrics_middleware(calculator_server_creator) -> None:
+    """The middleware counts calls, errors and latencies."""
+    metrics = Metrics(buckets=(0.5, 1.0))
+    serv = calculator_server_creator(
+        Calculator, middleware=[metrics.middleware]
+    )
+
+    @serv.implement(Calculator.call_none)
+    async def call_none() -> int:
+        raise ValueError()
+
+    await serv.process(Call("add", (1, 2)), None)
+    await serv.process(Call("add", (1, 2)), None)
+    with pytest.raises(ValueError):
+        await serv.process(Call("call_none", ()), None)
+
+    lines = metrics.render().splitlines()
+
+    assert 'pyrseia_calls_total{method="add"} 2' in lines
+    assert 'pyrseia_errors_total{method="add"} 0' in lines
+    assert 'pyrseia_errors_total{method="call_none"} 1' in lines
+    assert 'pyrseia_in_flight{method="add"} 0' in lines
+    assert (
+        'pyrseia_call_duration_seconds_bucket{method="add",le="0.5"} 2'
+        in lines
+    )
+    assert (
+        'pyrseia_call_duration_seconds_bucket{method="add",le="+Inf"} 2'
+        in lines
+    )
+    assert 'pyrseia_call_duration_seconds_count{method="add"} 2' in lines
+
+
+@pytest.mark.asyncio
+async def test_aiohttp_metrics_route(
+    unused_tcp_port: int, calculator_server_creator
+) -> None:
+    """The aiohttp app exposes metrics."""
+    metrics = Metrics()
+    serv = calculator_server_creator(
+        AioRequest, middleware=[metrics.middleware]
+    )
+    app = create_aiohttp_app(serv, metrics=metrics)
+
+    runner = AppRunner(app)
+    await runner.setup()
+    site = TCPSite(runner, port=unused_tcp_port)
+    await site.start()
+
+    t = await create_client(
+        Calculator,
+        aiohttp_client_adapter(f"http://localhost:{unused_tcp_port}"),
+    )
+    await t.add(1, 2)
+
+    async with ClientSession() as session:
+        async with session.get(
+            f"http://localhost:{unused_tcp_port}/metrics"
+        ) as resp:
+            assert resp.headers["Content-Type"].startswith("text/plain")
+            text = await resp.text()
+
+    assert 'pyrseia_calls_total{method="add"} 1' in text.splitlines()
+
+    await close_client(t)
+    await runner.cleanup()
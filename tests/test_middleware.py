@@ -4,6 +4,7 @@ from typing import Any
 import pytest  # type: ignore
 from attr import evolve
 
+from pyrseia import scoped
 from pyrseia.wire import Call
 
 from .calculator import Calculator
@@ -90,3 +91,27 @@ async def test_ctx_mutating_middleware(calculator_server_creator) -> None:
 
     assert call_none_resp == 2
     assert call_one_task.result() == 2
+
+
+@pytest.mark.asyncio
+async def test_scoped_middleware(calculator_server_creator) -> None:
+    """Scoped middleware only wraps the methods it applies to."""
+    seen = []
+
+    async def recording_middleware(ctx, call: Call, next) -> Any:
+        seen.append(call.name)
+        return await next(ctx, call)
+
+    serv = calculator_server_creator(
+        Calculator,
+        middleware=[
+            scoped(recording_middleware, Calculator.call_one),
+            scoped(recording_middleware, predicate=lambda n: n == "add"),
+        ],
+    )
+
+    assert await serv.process(Call("call_one", (1,)), None) == 1
+    assert await serv.process(Call("add", (1, 2)), None) == 3
+    assert await serv.process(Call("multiply", (2, 3)), None) == 6
+
+    assert seen == ["call_one", "add"]
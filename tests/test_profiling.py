@@ -0,0 +1,142 @@
+from threading import enumerate as enumerate_threads
+from time import perf_counter
+
+import pytest  # type: ignore
+from aiohttp import ClientSession
+from aiohttp.web import AppRunner
+from aiohttp.web import Request as AioRequest
+from aiohttp.web import TCPSite
+from msgpack import dumps
+
+from pyrseia.aiohttp import create_aiohttp_app
+from pyrseia.asgi import AsgiRequest
+from pyrseia.profiling import SamplingProfiler
+from pyrseia.wire import Call
+
+from .calculator import Calculator
+
+
+class Ctx:
+    def __init__(self, headers):
+        self.headers = headers
+
+
+def busy_loop(duration: float) -> None:
+    end = perf_counter() + duration
+    while perf_counter() < end:
+        pass
+
+
+@pytest.mark.asyncio
+async def test_profiling_middleware(calculator_server_creator) -> None:
+    """Calls with the debug header are profiled, others aren't."""
+    profiler = SamplingProfiler(
+        debug_header="X-Pyrseia-Profile", interval=0.001
+    )
+    serv = calculator_server_creator(
+        Calculator, middleware=[profiler.middleware]
+    )
+
+    @serv.implement(Calculator.call_one)
+    async def call_one(i: int) -> int:
+        busy_loop(0.05)
+        return i
+
+    await serv.process(Call("call_one", (1,)), Ctx({}))
+    assert profiler.collapsed() == ""
+
+    await serv.process(
+        Call("call_one", (1,)), Ctx({"X-Pyrseia-Profile": "1"})
+    )
+
+    stacks = profiler.collapsed().splitlines()
+    assert stacks
+    assert all(s.startswith("call_one;") for s in stacks)
+    assert any("busy_loop" in s for s in stacks)
+
+    profiler.reset()
+    assert profiler.collapsed() == ""
+
+    profiler.close()
+    assert not any(t.name == "pyrseia-profiler" for t in enumerate_threads())
+
+
+@pytest.mark.asyncio
+async def test_no_debug_header_by_default(calculator_server_creator) -> None:
+    """The debug header must be opted into."""
+    profiler = SamplingProfiler(interval=0.001)
+    serv = calculator_server_creator(
+        Calculator, middleware=[profiler.middleware]
+    )
+
+    await serv.process(
+        Call("call_one", (1,)), Ctx({"X-Pyrseia-Profile": "1"})
+    )
+
+    assert profiler.collapsed() == ""
+
+
+@pytest.mark.asyncio
+async def test_asgi_debug_header(calculator_server_creator) -> None:
+    """Debug headers match lowercase ASGI header names, whatever the case."""
+    profiler = SamplingProfiler(
+        debug_header="X-Pyrseia-Profile", interval=0.001
+    )
+    serv = calculator_server_creator(
+        AsgiRequest, middleware=[profiler.middleware]
+    )
+
+    @serv.implement(Calculator.call_one)
+    async def call_one(i: int) -> int:
+        busy_loop(0.02)
+        return i
+
+    request = AsgiRequest(
+        {"type": "http", "headers": [(b"x-pyrseia-profile", b"1")]}
+    )
+    await serv.process(Call("call_one", (1,)), request)
+
+    assert profiler.collapsed() != ""
+    profiler.close()
+
+
+@pytest.mark.asyncio
+async def test_aiohttp_profile_route(
+    unused_tcp_port: int, calculator_server_creator
+) -> None:
+    """The aiohttp app serves the collected stacks."""
+    profiler = SamplingProfiler(
+        debug_header="X-Pyrseia-Profile", interval=0.001
+    )
+    serv = calculator_server_creator(
+        AioRequest, middleware=[profiler.middleware]
+    )
+
+    @serv.implement(Calculator.call_one)
+    async def call_one(i: int) -> int:
+        busy_loop(0.05)
+        return i
+
+    app = create_aiohttp_app(serv, profiler=profiler)
+    runner = AppRunner(app)
+    await runner.setup()
+    site = TCPSite(runner, port=unused_tcp_port)
+    await site.start()
+
+    url = f"http://localhost:{unused_tcp_port}"
+    async with ClientSession() as session:
+        async with session.post(
+            url,
+            data=dumps({"name": "call_one", "args": [1]}),
+            headers={"X-Pyrseia-Profile": "1"},
+        ):
+            pass
+        async with session.get(f"{url}/debug/profile?reset") as resp:
+            stacks = await resp.text()
+        async with session.get(f"{url}/debug/profile") as resp:
+            assert await resp.text() == ""
+
+    assert any("busy_loop" in s for s in stacks.splitlines())
+
+    await runner.cleanup()
+    assert not any(t.name == "pyrseia-profiler" for t in enumerate_threads())
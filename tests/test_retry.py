@@ -0,0 +1,99 @@
+from contextlib import asynccontextmanager
+
+import pytest  # type: ignore
+from aiohttp import ServerDisconnectedError
+
+from pyrseia import close_client, create_client
+from pyrseia.retry import RetryBudget, RetryPolicy, retrying_client_adapter
+from pyrseia.wire import Call
+
+from .calculator import Calculator
+
+
+def flaky_adapter(failures: int, calls: list, error=ConnectionResetError):
+    @asynccontextmanager
+    async def adapter():
+        async def sender(call: Call, _):
+            calls.append(call.name)
+            if len(calls) <= failures:
+                raise error()
+            return sum(call.args)
+
+        yield sender
+
+    return adapter()
+
+
+@pytest.mark.asyncio
+async def test_retries() -> None:
+    """Retryable errors are retried, per method."""
+    calls: list = []
+    policy = RetryPolicy(max_attempts=3, base_delay=0.001)
+    t = await create_client(
+        Calculator,
+        retrying_client_adapter(
+            flaky_adapter(2, calls), policies={"add": policy}
+        ),
+    )
+
+    assert await t.add(1, 2) == 3
+    assert calls == ["add"] * 3
+
+    await close_client(t)
+
+
+@pytest.mark.asyncio
+async def test_aiohttp_errors_retried() -> None:
+    """aiohttp's connection errors are retried by default."""
+    calls: list = []
+    t = await create_client(
+        Calculator,
+        retrying_client_adapter(
+            flaky_adapter(1, calls, ServerDisconnectedError),
+            default=RetryPolicy(base_delay=0.001),
+        ),
+    )
+
+    assert await t.add(1, 2) == 3
+    assert calls == ["add"] * 2
+    await close_client(t)
+
+
+@pytest.mark.asyncio
+async def test_no_policy_no_retry() -> None:
+    """Methods without a policy aren't retried."""
+    calls: list = []
+    policy = RetryPolicy(base_delay=0.001)
+    t = await create_client(
+        Calculator,
+        retrying_client_adapter(
+            flaky_adapter(1, calls), policies={"add": policy}
+        ),
+    )
+
+    with pytest.raises(ConnectionResetError):
+        await t.multiply(1, 2)
+    assert calls == ["multiply"]
+
+    await close_client(t)
+
+
+@pytest.mark.asyncio
+async def test_budget_exhaustion() -> None:
+    """An empty budget stops retries."""
+    calls: list = []
+    budget = RetryBudget(ratio=0.0, min_per_second=0.0)
+    t = await create_client(
+        Calculator,
+        retrying_client_adapter(
+            flaky_adapter(1, calls),
+            default=RetryPolicy(base_delay=0.001),
+            budget=budget,
+        ),
+    )
+
+    with pytest.raises(ConnectionResetError):
+        await t.add(1, 2)
+    assert calls == ["add"]
+
+    await close_client(t)
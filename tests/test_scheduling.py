@@ -0,0 +1,120 @@
+from asyncio import Event, create_task, gather, sleep, wait_for
+
+import pytest  # type: ignore
+
+from pyrseia import priority, rpc, server
+from pyrseia.scheduling import FairScheduler, OverloadedError
+from pyrseia.timing import StageTimings
+from pyrseia.wire import Call
+
+
+class Jobs:
+    @priority("interactive")
+    @rpc
+    async def lookup(self, i: int) -> int:
+        ...
+
+    @priority("batch")
+    @rpc
+    async def backfill(self, i: int) -> int:
+        ...
+
+
+def create_server(scheduler: FairScheduler):
+    serv = server(Jobs, str, scheduler=scheduler)
+    order = []
+    gate = Event()
+
+    @serv.implement(Jobs.lookup)
+    async def lookup(i: int) -> int:
+        if i < 0:
+            await gate.wait()
+        order.append(("lookup", i))
+        return i
+
+    @serv.implement(Jobs.backfill)
+    async def backfill(i: int) -> int:
+        order.append(("backfill", i))
+        return i
+
+    return serv, order, gate
+
+
+@pytest.mark.asyncio
+async def test_weighted_fair_admission() -> None:
+    """Backlogged classes are admitted by weight, in order within a class."""
+    scheduler: FairScheduler[str] = FairScheduler(
+        limit=1, weights={"interactive": 4}
+    )
+    serv, order, gate = create_server(scheduler)
+
+    blocker = create_task(serv.process(Call("lookup", (-1,)), ""))
+    await sleep(0)
+    calls = [
+        create_task(serv.process(Call("backfill", (i,)), ""))
+        for i in range(8)
+    ]
+    calls += [
+        create_task(serv.process(Call("lookup", (i,)), "")) for i in range(4)
+    ]
+    await sleep(0)
+    assert scheduler.queued == 12
+
+    gate.set()
+    await gather(blocker, *calls)
+
+    assert order[:4] == [("lookup", -1)] + [("lookup", i) for i in range(3)]
+    assert ("lookup", 3) in order[4:6]
+    assert [i for n, i in order if n == "backfill"] == list(range(8))
+    assert scheduler.in_flight == 0
+    assert scheduler.queued == 0
+
+
+@pytest.mark.asyncio
+async def test_classify_and_overload() -> None:
+    """Request contexts can pick the class, and full queues reject calls."""
+    scheduler = FairScheduler(
+        limit=1,
+        weights={"tenant-a": 10, "interactive": 1},
+        max_queue=2,
+        classify=lambda ctx, call: ctx or None,
+    )
+    serv, order, gate = create_server(scheduler)
+
+    blocker = create_task(serv.process(Call("lookup", (-1,)), ""))
+    await sleep(0)
+    slow = create_task(serv.process(Call("lookup", (1,)), ""))
+    await sleep(0)
+    fast = create_task(serv.process(Call("backfill", (2,)), "tenant-a"))
+    await sleep(0)
+
+    with pytest.raises(OverloadedError):
+        await serv.process(Call("lookup", (3,)), "")
+
+    gate.set()
+    await gather(blocker, slow, fast)
+    assert order == [("lookup", -1), ("backfill", 2), ("lookup", 1)]
+
+
+@pytest.mark.asyncio
+async def test_cancellation_and_timings() -> None:
+    """Cancelled waiters don't hold slots, and queueing is timed."""
+    scheduler: FairScheduler[str] = FairScheduler(limit=1)
+    serv, order, gate = create_server(scheduler)
+
+    blocker = create_task(serv.process(Call("lookup", (-1,)), ""))
+    await sleep(0)
+    cancelled = create_task(serv.process(Call("backfill", (1,)), ""))
+    timings = StageTimings()
+    timed = create_task(serv.process(Call("backfill", (2,)), "", timings))
+    await sleep(0)
+    cancelled.cancel()
+    await sleep(0.01)
+    gate.set()
+
+    assert await wait_for(timed, 1) == 2
+    await blocker
+    assert order == [("lookup", -1), ("backfill", 2)]
+    assert timings.queue >= 0.01
+    assert scheduler.in_flight == 0
+    assert scheduler.queued == 0
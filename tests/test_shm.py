@@ -0,0 +1,167 @@
+import logging
+import sys
+from asyncio import (
+    Event,
+    create_subprocess_exec,
+    open_unix_connection,
+    sleep,
+    wait_for,
+)
+from asyncio.subprocess import PIPE
+from os import environ, pathsep
+
+import pytest  # type: ignore
+
+from pyrseia import close_client, create_client
+from pyrseia.shm import (
+    _FRAME,
+    _HANDSHAKE,
+    RemoteError,
+    _Kind,
+    _Ring,
+    serve_shm,
+    shm_client_adapter,
+)
+
+from .calculator import Calculator
+
+SERVER = """
+import asyncio, sys
+from pyrseia import server
+from pyrseia.shm import serve_shm
+from tests.calculator import Calculator
+
+serv = server(Calculator)
+
+@serv.implement(Calculator.add)
+async def add(a: int, b: int) -> int:
+    return a + b
+
+async def main():
+    async with serve_shm(serv, sys.argv[1]):
+        print("ready", flush=True)
+        await asyncio.Event().wait()
+
+asyncio.run(main())
+"""
+
+
+def test_ring() -> None:
+    """Space is reclaimed up to the oldest region in use."""
+    ring = _Ring(100)
+
+    assert ring.alloc(40) == 0
+    assert ring.alloc(40) == 40
+    assert ring.alloc(40) is None
+    ring.free(40)
+    # The first region is still in use.
+    assert ring.alloc(30) is None
+    ring.free(0)
+    assert ring.alloc(100) == 0
+    ring.free(0)
+
+    assert ring.alloc(60) == 0
+    assert ring.alloc(30) == 60
+    ring.free(0)
+    # Wraps around to the start.
+    assert ring.alloc(50) == 0
+    assert ring.alloc(20) is None
+    assert ring.alloc(10) == 50
+    assert ring.alloc(101) is None
+
+
+@pytest.mark.asyncio
+async def test_shm(tmp_path, calculator_server_creator) -> None:
+    serv = calculator_server_creator(type(None))
+    notified = Event()
+
+    @serv.implement(Calculator.call_four)
+    async def call_four(i: int, s: str, f: float, b: bytes) -> bytes:
+        if i < 0:
+            raise ValueError()
+        return b * i
+
+    @serv.implement(Calculator.notify)
+    async def notify(i: int) -> None:
+        notified.set()
+
+    path = str(tmp_path / "pyrseia.sock")
+    async with serve_shm(serv, path):
+        t = await create_client(
+            Calculator, shm_client_adapter(path, ring_size=64 * 1024)
+        )
+        assert await t.add(1, 2) == 3
+        # Through the rings, and too large for them.
+        for size in (10_000, 100_000):
+            assert await t.call_four(2, "", 0.0, b"a" * size) == b"a" * (
+                2 * size
+            )
+        with pytest.raises(RemoteError):
+            await t.call_four(-1, "", 0.0, b"")
+        await t.notify(1)
+        await notified.wait()
+        await close_client(t)
+
+
+@pytest.mark.asyncio
+async def test_shm_server_killed(tmp_path) -> None:
+    """Calls fail right away once the server is gone."""
+    path = str(tmp_path / "pyrseia.sock")
+    proc = await create_subprocess_exec(
+        sys.executable,
+        "-c",
+        SERVER,
+        path,
+        stdout=PIPE,
+        env={**environ, "PYTHONPATH": pathsep.join(sys.path)},
+    )
+    assert proc.stdout is not None
+    try:
+        assert await wait_for(proc.stdout.readline(), 10) == b"ready\n"
+        t = await create_client(Calculator, shm_client_adapter(path))
+        assert await t.add(1, 2) == 3
+    finally:
+        proc.kill()
+        await proc.wait()
+
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            await wait_for(t.add(1, 2), 1)
+    await close_client(t)
+
+
+@pytest.mark.asyncio
+async def test_shm_server_closed(
+    tmp_path, calculator_server_creator, caplog
+) -> None:
+    """Closing the server closes its connections, quietly."""
+    serv = calculator_server_creator(type(None))
+    path = str(tmp_path / "pyrseia.sock")
+    async with serve_shm(serv, path):
+        t = await create_client(Calculator, shm_client_adapter(path))
+        assert await t.add(1, 2) == 3
+
+    with pytest.raises(ConnectionError):
+        await wait_for(t.add(1, 2), 1)
+    await close_client(t)
+    await sleep(0)
+    assert not [r for r in caplog.records if r.levelno >= logging.ERROR]
+
+
+@pytest.mark.asyncio
+async def test_shm_missing_memory(tmp_path, calculator_server_creator) -> None:
+    """Connections to shared memory that's gone are refused."""
+    serv = calculator_server_creator(type(None))
+    path = str(tmp_path / "pyrseia.sock")
+    async with serve_shm(serv, path):
+        reader, writer = await open_unix_connection(path)
+        name = b"pyrseia-missing"
+        writer.write(_HANDSHAKE.pack(len(name), 1024))
+        writer.write(name)
+        kind, call_id, _, length = _FRAME.unpack(
+            await wait_for(reader.readexactly(_FRAME.size), 1)
+        )
+        assert (kind, call_id) == (_Kind.ERROR, 0)
+        assert b"not found" in await reader.readexactly(length)
+        assert await wait_for(reader.read(), 1) == b""
+        writer.close()
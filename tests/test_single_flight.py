@@ -0,0 +1,82 @@
+from asyncio import gather, sleep
+from contextlib import asynccontextmanager
+from typing import List
+
+import pytest  # type: ignore
+
+from pyrseia import close_client, create_client
+from pyrseia.wire import Call
+
+from .calculator import Calculator
+
+
+def slow_adapter(calls: List[Call]):
+    @asynccontextmanager
+    async def adapter():
+        async def sender(call: Call, _):
+            calls.append(call)
+            await sleep(0.01)
+            if call.name == "multiply":
+                raise ValueError()
+            return sum(call.args)
+
+        yield sender
+
+    return adapter()
+
+
+@pytest.mark.asyncio
+async def test_single_flight() -> None:
+    """Identical concurrent calls share a request."""
+    calls: List[Call] = []
+    t = await create_client(
+        Calculator, slow_adapter(calls), single_flight=True
+    )
+
+    res = await gather(t.add(1, 2), t.add(1, 2), t.add(2, 2))
+    assert res == [3, 3, 4]
+    assert calls == [Call("add", (1, 2)), Call("add", (2, 2))]
+
+    # Errors are shared too.
+    res = await gather(
+        t.multiply(1, 2), t.multiply(1, 2), return_exceptions=True
+    )
+    assert all(isinstance(r, ValueError) for r in res)
+    assert len(calls) == 3
+
+    # Sequential calls aren't coalesced.
+    assert await t.add(1, 2) == 3
+    assert len(calls) == 4
+
+    # Nor are equal arguments of different types.
+    await gather(t.add(1, 2), t.add(True, 2))
+    assert len(calls) == 6
+
+    await close_client(t)
+
+
+@pytest.mark.asyncio
+async def test_single_flight_idempotent_only() -> None:
+    """Only idempotent methods are coalesced, never notifications."""
+    calls: List[Call] = []
+    t = await create_client(
+        Calculator, slow_adapter(calls), single_flight=True
+    )
+
+    await gather(t.call_one(1), t.call_one(1))
+    await gather(t.notify(1), t.notify(1))
+    assert len(calls) == 4
+
+    await close_client(t)
+
+
+@pytest.mark.asyncio
+async def test_no_single_flight() -> None:
+    """Calls are not coalesced by default."""
+    calls: List[Call] = []
+    t = await create_client(Calculator, slow_adapter(calls))
+
+    await gather(t.add(1, 2), t.add(1, 2))
+    assert len(calls) == 2
+
+    await close_client(t)
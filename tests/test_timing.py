@@ -0,0 +1,120 @@
+from asyncio import Event, create_task, sleep
+from typing import List
+
+import pytest  # type: ignore
+from aiohttp.web import AppRunner
+from aiohttp.web import Request as AioRequest
+from aiohttp.web import TCPSite
+from hypercorn.asyncio import serve
+from hypercorn.config import Config
+from starlette.requests import Request as StarletteRequest
+
+from pyrseia import close_client, create_client
+from pyrseia.aiohttp import aiohttp_client_adapter, create_aiohttp_app
+from pyrseia.httpx import httpx_client_adapter
+from pyrseia.starlette import create_starlette_app
+from pyrseia.timing import StageTimings
+from pyrseia.wire import Call
+
+from .calculator import Calculator
+
+
+@pytest.mark.asyncio
+async def test_process_timings(calculator_server_creator) -> None:
+    """Middleware and handler time are reported separately."""
+
+    async def slow_middleware(ctx, call: Call, next):
+        await sleep(0.02)
+        return await next(ctx, call)
+
+    serv = calculator_server_creator(
+        Calculator, middleware=[slow_middleware]
+    )
+
+    @serv.implement(Calculator.call_one)
+    async def call_one(i: int) -> int:
+        await sleep(0.01)
+        return i
+
+    timings = StageTimings()
+    assert await serv.process(Call("call_one", (1,)), None, timings) == 1
+
+    assert timings.handler >= 0.01
+    assert timings.middleware >= 0.02
+
+
+@pytest.mark.asyncio
+async def test_aiohttp_timings(
+    unused_tcp_port: int, calculator_server_creator
+) -> None:
+    """The aiohttp app and client report stage timings."""
+    server_timings: List[StageTimings] = []
+    client_timings: List[StageTimings] = []
+    serv = calculator_server_creator(AioRequest)
+    app = create_aiohttp_app(serv, timing_hook=server_timings.append)
+
+    runner = AppRunner(app)
+    await runner.setup()
+    site = TCPSite(runner, port=unused_tcp_port)
+    await site.start()
+
+    t = await create_client(
+        Calculator,
+        aiohttp_client_adapter(
+            f"http://localhost:{unused_tcp_port}",
+            timing_hook=client_timings.append,
+        ),
+    )
+    assert await t.add(1, 2) == 3
+
+    await close_client(t)
+    await runner.cleanup()
+
+    [server] = server_timings
+    assert server.method == "add"
+    assert server.handler > 0
+    assert server.write > 0
+    [client] = client_timings
+    assert client.method == "add"
+    assert client.write > server.handler
+
+
+@pytest.mark.asyncio
+async def test_starlette_timings(
+    unused_tcp_port: int, calculator_server_creator
+) -> None:
+    """The Starlette app and httpx client report stage timings."""
+    server_timings: List[StageTimings] = []
+    client_timings: List[StageTimings] = []
+    serv = calculator_server_creator(StarletteRequest)
+    app = create_starlette_app(serv, timing_hook=server_timings.append)
+
+    config = Config()
+    config.bind = [f"localhost:{unused_tcp_port}"]
+    shutdown_event = Event()
+
+    task = create_task(
+        serve(app, config, shutdown_trigger=shutdown_event.wait)  # type: ignore
+    )
+    await sleep(0.1)  # Wait for the server to start up.
+
+    t = await create_client(
+        Calculator,
+        httpx_client_adapter(
+            f"http://localhost:{unused_tcp_port}",
+            timing_hook=client_timings.append,
+        ),
+    )
+    assert await t.add(1, 2) == 3
+
+    await close_client(t)
+    shutdown_event.set()
+    await task
+
+    [server] = server_timings
+    assert server.method == "add"
+    assert server.handler > 0
+    assert server.write > 0
+    [client] = client_timings
+    assert client.method == "add"
+    assert client.structure > 0
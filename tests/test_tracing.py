@@ -0,0 +1,134 @@
+from asyncio import Event, ensure_future, gather, sleep
+
+import pytest  # type: ignore
+from aiohttp.web import AppRunner
+from aiohttp.web import Request as AioRequest
+from aiohttp.web import TCPSite
+
+from pyrseia import close_client, create_client, rpc, server
+from pyrseia.aiohttp import aiohttp_client_adapter, create_aiohttp_app
+from pyrseia.scheduling import FairScheduler
+from pyrseia.tracing import (
+    InMemoryExporter,
+    SpanContext,
+    SpanKind,
+    Tracer,
+    current_span,
+    request_span,
+    traced_process,
+    tracing_client_adapter,
+)
+from pyrseia.wire import Call
+
+from .calculator import Calculator
+
+
+def test_traceparent() -> None:
+    ctx = SpanContext("a" * 32, "b" * 16)
+    assert SpanContext.from_header(ctx.to_header()) == ctx
+    assert SpanContext.from_header("garbage") is None
+    assert SpanContext.from_header(None) is None
+    for header in (
+        f"00-{'g' * 32}-{'b' * 16}-01",
+        f"00-{'A' * 32}-{'b' * 16}-01",
+        f"00-{'0' * 32}-{'b' * 16}-01",
+        f"00-{'a' * 32}-{'0' * 16}-01",
+        f"ff-{'a' * 32}-{'b' * 16}-01",
+        f"00-{'a' * 32}-{'b' * 16}-01-extra",
+        f"00-{'a' * 32}-{'b' * 16}-1",
+    ):
+        assert SpanContext.from_header(header) is None, header
+    # Later versions may add fields.
+    assert SpanContext.from_header(f"01-{'a' * 32}-{'b' * 16}-01-x") == ctx
+
+
+@pytest.mark.asyncio
+async def test_aiohttp_tracing(
+    unused_tcp_port: int, calculator_server_creator
+) -> None:
+    """Spans are propagated from clients to servers."""
+    exporter = InMemoryExporter()
+    tracer = Tracer(exporter)
+    serv = calculator_server_creator(AioRequest)
+    seen = []
+    notified = Event()
+
+    @serv.implement(Calculator.call_one)
+    async def call_one(ctx: AioRequest, i: int) -> int:
+        seen.append((request_span(ctx), current_span.get()))
+        return i
+
+    @serv.implement(Calculator.notify)
+    async def notify(i: int) -> None:
+        notified.set()
+
+    app = create_aiohttp_app(serv, tracer=tracer)
+
+    runner = AppRunner(app)
+    await runner.setup()
+    site = TCPSite(runner, port=unused_tcp_port)
+    await site.start()
+
+    t = await create_client(
+        Calculator,
+        tracing_client_adapter(
+            aiohttp_client_adapter(f"http://localhost:{unused_tcp_port}"),
+            tracer,
+        ),
+    )
+    assert await t.call_one(1) == 1
+
+    spans = {s.kind: s for s in exporter.spans}
+    client = spans[SpanKind.CLIENT]
+    server = spans[SpanKind.SERVER]
+    handler = spans[SpanKind.HANDLER]
+    assert client.parent_id is None
+    assert server.name == "call_one"
+    assert server.parent_id == client.context.span_id
+    assert handler.parent_id == server.context.span_id
+    assert len({s.context.trace_id for s in exporter.spans}) == 1
+    assert seen == [(server, handler)]
+
+    exporter.spans.clear()
+    await t.notify(1)
+    await notified.wait()
+    await close_client(t)
+    await runner.cleanup()
+
+    kinds = sorted(s.kind for s in exporter.spans)
+    assert kinds == sorted(
+        [SpanKind.CLIENT, SpanKind.SERVER, SpanKind.QUEUE, SpanKind.HANDLER]
+    )
+
+
+class Gated:
+    @rpc
+    async def wait(self) -> None:
+        ...
+
+
+@pytest.mark.asyncio
+async def test_scheduler_queue_span() -> None:
+    """Calls waiting for the scheduler get a queue span."""
+    exporter = InMemoryExporter()
+    tracer = Tracer(exporter)
+    serv = server(Gated, str, scheduler=FairScheduler(limit=1))
+    gate = Event()
+
+    @serv.implement(Gated.wait)
+    async def wait() -> None:
+        await gate.wait()
+
+    process = traced_process(tracer, serv.process)
+    first = ensure_future(process(Call("wait", ()), ""))
+    await sleep(0)
+    second = ensure_future(process(Call("wait", ()), ""))
+    await sleep(0.01)
+    gate.set()
+    await gather(first, second)
+
+    queue = [s for s in exporter.spans if s.kind is SpanKind.QUEUE]
+    handlers = [s for s in exporter.spans if s.kind is SpanKind.HANDLER]
+    assert len(queue) == 1 and len(handlers) == 2
+    assert queue[0].duration >= 0.01  # type: ignore
+    assert queue[0].parent_id in {h.context.span_id for h in handlers}